@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class CounterField(models.PositiveIntegerField):
+    """
+    Денормализованный счетчик.
+
+    Меняется только F-выражениями в CounterService, поэтому save() существующей
+    строки оставляет в UPDATE значение из БД: значение в памяти могло
+    устареть. При вставке, в том числе повторной вставке строки, удаленной
+    в другом месте, пишется значение экземпляра.
+    """
+
+    def pre_save(self, model_instance, add):
+        if add:
+            return super().pre_save(model_instance, add)
+        return models.F(self.attname)
@@ -43,31 +43,34 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "users",
     "post",
     "crispy_forms",
     "crispy_bootstrap5",
     "rest_framework",
     "rest_framework_simplejwt",
-    'corsheaders',
+    "corsheaders",
 ]
 
 MIDDLEWARE = [
+    "post.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "post.profiling.ProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    'corsheaders.middleware.CorsMiddleware',
+    "corsheaders.middleware.CorsMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "post.metrics.TimedDjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -90,7 +93,7 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 DATABASES = {
     "default": {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        "ENGINE": "django.db.backends.postgresql_psycopg2",
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
@@ -100,6 +103,34 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Кеш должен быть общим для всех процессов (Redis, Memcached): команды
+# оплаты и истечения подписок сбрасывают кеш веб-воркеров. LocMemCache
+# годится только для разработки, check --deploy его не пропускает
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Время жизни закешированного статуса подписки пользователя, в секундах
+ENTITLEMENT_CACHE_TIMEOUT = 300
+
+# Время жизни закешированной карточки поста, в секундах
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+
+# Время жизни закешированных страниц для анонимных посетителей, в секундах
+RESPONSE_CACHE_TIMEOUT = 10 * 60
+
+# Время жизни закешированной шапки страницы автора, в секундах
+AUTHOR_HEADER_CACHE_TIMEOUT = 60 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -156,6 +187,45 @@ MEDIA_URL = "/media/"
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Отдача медиафайлов фронтовым веб-сервером после проверки доступа в Django:
+# "nginx" - заголовок X-Accel-Redirect, "sendfile" - X-Sendfile, пусто - отдает Django
+MEDIA_ACCEL_BACKEND = os.getenv("MEDIA_ACCEL_BACKEND", "")
+# Внутренний location nginx, смотрящий в MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX") or "/protected-media/"
+
+# Метрики контроллеров для Prometheus (/metrics). Без токена доступны только персоналу.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Каталог для сложения метрик воркеров gunicorn, пусто - метрики одного процесса
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+# Как часто процесс сбрасывает свои метрики в METRICS_DIR, в секундах
+METRICS_FLUSH_INTERVAL = 5
+
+# Сохранение медленных запросов с их SQL в таблицу SlowRequest (в админке).
+# Порог времени ответа в мс, 0 - выключено
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "0"))
+# Запрос сохраняется и тогда, когда один его SQL-запрос дольше этого порога, в мс
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "0"))
+# Для скольких самых долгих шаблонов SQL получать план EXPLAIN
+SLOW_REQUEST_EXPLAIN = 3
+# Сколько SQL-запросов одного запроса запоминать
+SLOW_REQUEST_MAX_STATEMENTS = 1000
+# Сколько последних медленных запросов хранить
+SLOW_REQUEST_KEEP = 1000
+# Не чаще одного сохранения на контроллер за столько секунд: при замедлении БД
+# медленными становятся все запросы, и сохранение не должно ее нагружать
+SLOW_REQUEST_CAPTURE_INTERVAL = 60
+
+# Профилирование запросов сэмплером (заголовок X-Profile: 1 от персонала или случайная
+# доля запросов), стеки пишутся в PROFILES_DIR. Долю без перезапуска меняет команда profiling
+PROFILES_DIR = os.getenv("PROFILES_DIR") or os.path.join(BASE_DIR, "profiles")
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+# Интервал между снимками стека, в секундах
+PROFILER_INTERVAL = 0.005
+# Как часто воркер перечитывает долю профилируемых запросов, в секундах
+PROFILER_RELOAD_INTERVAL = 10
+# Сколько последних профилей хранить, более старые удаляются при записи нового
+PROFILER_KEEP = 1000
+
 AUTH_USER_MODEL = "users.User"
 
 LOGIN_REDIRECT_URL = "/"
@@ -169,6 +239,7 @@ SIMPLE_JWT = {
 }
 
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 
 ACCOUNT_SID = os.getenv("ACCOUNT_SID")
 AUTH_TOKEN = os.getenv("AUTH_TOKEN")
@@ -184,8 +255,8 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 ALLOWED_HOSTS = [
-    '0.0.0.0',  # добавьте этот хост
-    'localhost',
-    '127.0.0.1',
+    "0.0.0.0",  # добавьте этот хост
+    "localhost",
+    "127.0.0.1",
     # другие хосты, если необходимо
-]
\ No newline at end of file
+]
@@ -1,6 +1,14 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import path
+from django.utils.dateparse import parse_date
+from django.utils.html import format_html, format_html_join
 
-from post.models import Post, Subscription
+from post.models import (ImportCheckpoint, Post, SlowRequest, StripeEvent,
+                         StripePrice, Subscription)
+from post.services import SubscriptionExportService
 
 
 # Register your models here.
@@ -12,3 +20,121 @@ class PostAdmin(admin.ModelAdmin):
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ("user", "type_of_sub")
+    change_list_template = "admin/post/subscription/change_list.html"
+
+    def get_urls(self):
+        """Добавляет адрес выгрузки подписок."""
+        return [
+            path(
+                "export/",
+                self.admin_site.admin_view(self.export_view),
+                name="post_subscription_export",
+            ),
+        ] + super().get_urls()
+
+    @staticmethod
+    def parse_export_date(value):
+        """Дата из параметра выгрузки, ValueError при неверном формате."""
+        if not value:
+            return None
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(value)
+        return date
+
+    def export_view(self, request):
+        """
+        Потоковая выгрузка подписок: ?format=csv|jsonl&start=ГГГГ-ММ-ДД&end=ГГГГ-ММ-ДД.
+
+        Память не растет с числом строк: подписки читаются серверным курсором,
+        а ответ отправляется по мере чтения.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        file_format = request.GET.get("format", "csv")
+        if file_format not in SubscriptionExportService.CONTENT_TYPES:
+            return HttpResponseBadRequest("Формат выгрузки: csv или jsonl.")
+        try:
+            start = self.parse_export_date(request.GET.get("start"))
+            end = self.parse_export_date(request.GET.get("end"))
+        except ValueError:
+            return HttpResponseBadRequest("Даты указываются в формате ГГГГ-ММ-ДД.")
+
+        # Под ASGI синхронный итератор был бы прочитан целиком до отправки
+        if isinstance(request, ASGIRequest):
+            content = SubscriptionExportService.astream(file_format, start, end)
+        else:
+            content = SubscriptionExportService.stream(file_format, start, end)
+        response = StreamingHttpResponse(
+            content, content_type=SubscriptionExportService.CONTENT_TYPES[file_format]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="subscriptions.{file_format}"'
+        )
+        # nginx передает куски клиенту сразу, не дожидаясь конца ответа
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+@admin.register(StripePrice)
+class StripePriceAdmin(admin.ModelAdmin):
+    list_display = ("type_of_sub", "amount", "interval", "price_id")
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "type", "received_at", "processed_at", "is_unmatched")
+    list_filter = ("type", "is_unmatched")
+
+
+@admin.register(ImportCheckpoint)
+class ImportCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("name", "position", "updated_at")
+
+
+@admin.register(SlowRequest)
+class SlowRequestAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "view_name",
+        "path",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "query_ms",
+    )
+    list_filter = ("view_name", "status_code")
+    search_fields = ("path",)
+    ordering = ("-id",)
+    exclude = ("statements",)
+    readonly_fields = ("statement_groups",)
+
+    def has_add_permission(self, request):
+        """Медленные запросы только сохраняются приложением."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Сохраненные запросы не редактируются."""
+        return False
+
+    @admin.display(description="SQL-запросы по шаблонам")
+    def statement_groups(self, obj):
+        """Шаблоны SQL с числом выполнений, временем и планом."""
+        return format_html_join(
+            "",
+            "<p><b>{} раз, всего {} мс, максимум {} мс</b></p><pre>{}</pre>{}",
+            (
+                (
+                    group["count"],
+                    group["total_ms"],
+                    group["max_ms"],
+                    group["sql"],
+                    (
+                        format_html("<pre>{}</pre>", group["plan"])
+                        if group.get("plan")
+                        else ""
+                    ),
+                )
+                for group in obj.statements
+            ),
+        )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PostConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "post"
+
+    def ready(self):
+        import post.checks  # noqa: F401
+        import post.signals  # noqa: F401
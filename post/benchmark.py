@@ -0,0 +1,245 @@
+import json
+import platform
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest.mock import patch
+
+import django
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from post.models import Post, Subscription
+from users.models import User
+
+# Перцентили времени ответа, по которым ищутся регрессии
+LATENCY_METRICS = ("p50_ms", "p95_ms")
+
+
+class Endpoint:
+    """
+    Страница для замера: имя маршрута, аргументы и от чьего имени запрос.
+
+    Кеш готовых ответов по умолчанию обходится: иначе после прогрева
+    анонимные страницы отдаются из него без запросов к БД и регрессия
+    в контроллере не видна. response_cache=True замеряет сам кеш.
+    """
+
+    def __init__(
+        self, name, url_name, role="anonymous", kwargs=None, response_cache=False
+    ):
+        self.name = name
+        self.url_name = url_name
+        self.role = role
+        self.kwargs = kwargs or (lambda actors: {})
+        self.response_cache = response_cache
+
+    def url(self, actors):
+        """Адрес страницы для подготовленных данных."""
+        return reverse(self.url_name, kwargs=self.kwargs(actors))
+
+
+ENDPOINTS = (
+    Endpoint("index", "post:index"),
+    Endpoint("index-cached", "post:index", response_cache=True),
+    Endpoint("post-list", "post:post-list", "subscriber"),
+    Endpoint(
+        "post-detail",
+        "post:post-detail",
+        "subscriber",
+        lambda actors: {"pk": actors["post"].pk},
+    ),
+    Endpoint("authors", "users:authors"),
+    Endpoint("choose-sub", "post:subscription", "reader"),
+    Endpoint(
+        "payment",
+        "post:subscription-payment",
+        "reader",
+        lambda actors: {"subscription_id": actors["subscription"].pk},
+    ),
+)
+
+
+async def fake_stripe_session(price_id):
+    """Заглушка создания сессии оплаты Stripe."""
+    return (
+        f"cs_bench_{price_id}",
+        "https://checkout.stripe.com/c/pay/bench",
+        timezone.now() + timedelta(hours=23),
+    )
+
+
+async def fake_stripe_price(amount, interval):
+    """Заглушка создания цены Stripe."""
+    return {"id": f"price_bench_{amount}_{interval}"}
+
+
+def stub_stripe():
+    """Подменяет обращения к Stripe локальными заглушками."""
+    stack = ExitStack()
+    stack.enter_context(patch("post.views.acreate_stripe_session", fake_stripe_session))
+    stack.enter_context(patch("post.services.aget_stripe_price", fake_stripe_price))
+    return stack
+
+
+def prepare_actors():
+    """
+    Пользователи и объекты, от имени которых и к которым идут запросы.
+
+    Создаются один раз: при повторном запуске на той же базе переиспользуются.
+    """
+    reader, _ = User.objects.get_or_create(
+        phone="bench-reader", defaults={"email": "bench-reader@example.com"}
+    )
+    subscriber, created = User.objects.get_or_create(
+        phone="bench-subscriber", defaults={"email": "bench-subscriber@example.com"}
+    )
+    if created:
+        Subscription.objects.create(
+            user=subscriber,
+            type_of_sub="one_month",
+            is_paid=True,
+            end_date=timezone.now() + timedelta(days=365),
+        )
+    subscription, _ = Subscription.objects.get_or_create(
+        user=reader, is_paid=False, defaults={"type_of_sub": "one_month"}
+    )
+    post = Post.objects.order_by("-id").first()
+    if post is None:
+        author, _ = User.objects.get_or_create(
+            phone="bench-author",
+            defaults={"email": "bench-author@example.com", "is_author": True},
+        )
+        post = Post.objects.create(author=author, title="Пост", is_free=True)
+    return {
+        "reader": reader,
+        "subscriber": subscriber,
+        "subscription": subscription,
+        "post": post,
+    }
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль отсортированной выборки с линейной интерполяцией."""
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        position - lower
+    )
+
+
+class QueryCounter:
+    """Обертка выполнения SQL, считающая запросы без журнала DEBUG."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(endpoint, actors, requests=50, warmup=5):
+    """Замеряет страницу: перцентили времени ответа, число запросов и размер."""
+    client = Client()
+    if endpoint.role != "anonymous":
+        client.force_login(actors[endpoint.role])
+    url = endpoint.url(actors)
+    timings = []
+    queries = []
+    sizes = []
+    with ExitStack() as stack:
+        if not endpoint.response_cache:
+            stack.enter_context(
+                patch("post.services.ResponseCache.get", return_value=None)
+            )
+        for number in range(warmup + requests):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = client.get(url)
+                content = (
+                    b"".join(response.streaming_content)
+                    if response.streaming
+                    else response.content
+                )
+                elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise RuntimeError(f"{endpoint.name}: {url} -> {response.status_code}")
+            if number >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(counter.count)
+                sizes.append(len(content))
+    timings.sort()
+    return {
+        "url": url,
+        "requests": requests,
+        "p50_ms": round(percentile(timings, 0.5), 3),
+        "p90_ms": round(percentile(timings, 0.9), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "queries": max(queries),
+        "bytes": max(sizes),
+    }
+
+
+def run(endpoints=ENDPOINTS, requests=50, warmup=5):
+    """Замеряет все страницы, Stripe при этом подменен заглушками."""
+    actors = prepare_actors()
+    with stub_stripe():
+        results = {
+            endpoint.name: measure(endpoint, actors, requests, warmup)
+            for endpoint in endpoints
+        }
+    return {
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "users": User.objects.count(),
+            "posts": Post.objects.count(),
+            "subscriptions": Subscription.objects.count(),
+        },
+        "endpoints": results,
+    }
+
+
+def compare(baseline, results, threshold=0.2):
+    """
+    Сравнивает результаты с базовыми и возвращает список регрессий.
+
+    Время ответа и размер страницы считаются регрессией при росте больше чем
+    на threshold, число запросов детерминировано - при любом росте.
+    """
+    regressions = []
+    for name, current in results["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if previous is None:
+            continue
+        for metric in (*LATENCY_METRICS, "bytes"):
+            if current[metric] > previous[metric] * (1 + threshold):
+                regressions.append((name, metric, previous[metric], current[metric]))
+        if current["queries"] > previous["queries"]:
+            regressions.append(
+                (name, "queries", previous["queries"], current["queries"])
+            )
+    return regressions
+
+
+def load(path):
+    """Читает файл результатов."""
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save(results, path):
+    """Сохраняет результаты в JSON."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+        file.write("\n")
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кеши, которые не видны другим процессам
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Кеш по умолчанию должен быть общим для процессов.
+
+    Статус подписки, карточки и страницы сбрасываются командами и воркерами
+    в других процессах: с локальным кешем сброс до веб-воркеров не доходит.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f"Кеш {backend} не общий для процессов: сбросы из команд и других "
+            "воркеров до веб-воркеров не дойдут.",
+            hint="Задайте CACHE_BACKEND и CACHE_LOCATION (Redis или Memcached).",
+            id="post.E001",
+        )
+    ]
@@ -0,0 +1,29 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """ETag из значений, от которых зависит содержимое ответа."""
+    digest = hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional_response(request, etag, last_modified=None, response=None):
+    """
+    Проверяет заголовки If-None-Match и If-Modified-Since.
+
+    Возвращает ответ 304, если у клиента актуальная версия, иначе response.
+    В обоих случаях ответ дополняется заголовками ETag и Last-Modified.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        response = not_modified
+    elif callable(response):
+        response = response()
+    response["ETag"] = etag
+    if timestamp is not None:
+        response["Last-Modified"] = http_date(timestamp)
+    return response
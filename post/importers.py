@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+from collections import Counter
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from post.models import ImportCheckpoint, Post
+from post.services import CounterService, ResponseCache
+from users.models import User
+from users.services import AuthorHeaderCache
+
+TRUE_VALUES = {"1", "true", "yes", "y", "да"}
+
+
+def read_records(path, file_format):
+    """Построчно читает записи из файла JSON Lines или CSV, не загружая его целиком."""
+    with open(path, encoding="utf-8", newline="") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def parse_bool(value):
+    """Булево значение из JSON или строки CSV."""
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+class PostImporter:
+    """
+    Пакетный импорт постов.
+
+    Авторы ищутся по телефону или почте в словаре, загруженном один раз.
+    Пачки вставляются через COPY на PostgreSQL или через bulk_create.
+    Сигналы при этом не вызываются: превью создает generate_thumbnails,
+    счетчики постов авторов обновляются в транзакции каждой пачки.
+    Поисковый вектор PostgreSQL рассчитывает сам.
+
+    Контрольная точка checkpoint хранится в БД и пишется в транзакции
+    пачки: пачка и номер ее последней записи фиксируются вместе.
+    """
+
+    COLUMNS = (
+        "author_id",
+        "title",
+        "description",
+        "preview",
+        "is_free",
+        "created_at",
+        "updated_at",
+    )
+
+    def __init__(self, batch_size=5000, use_copy=None, checkpoint=None):
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        if use_copy is None:
+            use_copy = connection.vendor == "postgresql"
+        self.use_copy = use_copy
+        self.title_max_length = Post._meta.get_field("title").max_length
+        self.imported = 0
+        self.skipped = 0
+        self.authors = set()
+        self.authors_by_phone = {}
+        self.authors_by_email = {}
+        for pk, phone, email in User.objects.values_list(
+            "pk", "phone", "email"
+        ).iterator(chunk_size=10000):
+            self.authors_by_phone[phone] = pk
+            self.authors_by_email[email.lower()] = pk
+
+    def resolve_author(self, record):
+        """id автора по полям author_phone или author_email записи."""
+        phone = str(record.get("author_phone") or "").strip()
+        email = str(record.get("author_email") or "").strip().lower()
+        return self.authors_by_phone.get(phone) or self.authors_by_email.get(email)
+
+    def build(self, record, now):
+        """
+        Строка таблицы постов из записи в порядке COLUMNS.
+
+        Возвращает None, если автор не найден или нет заголовка.
+        """
+        author_id = self.resolve_author(record)
+        title = str(record.get("title") or "").strip()
+        if author_id is None or not title:
+            return None
+        return (
+            author_id,
+            title[: self.title_max_length],
+            record.get("description") or None,
+            record.get("preview") or None,
+            parse_bool(record.get("is_free")),
+            now,
+            now,
+        )
+
+    def saved_position(self):
+        """Номер последней записи, обработанной прошлыми запусками."""
+        if self.checkpoint is None:
+            return 0
+        return (
+            ImportCheckpoint.objects.filter(name=self.checkpoint)
+            .values_list("position", flat=True)
+            .first()
+            or 0
+        )
+
+    def save_position(self, position):
+        """Сохраняет контрольную точку, в транзакции пачки - вместе с ней."""
+        if self.checkpoint is not None:
+            ImportCheckpoint.objects.update_or_create(
+                name=self.checkpoint, defaults={"position": position}
+            )
+
+    def insert(self, rows, position):
+        """
+        Вставляет пачку строк, обновляет счетчики ее авторов и контрольную
+        точку одной транзакцией.
+        """
+        counts = Counter(row[0] for row in rows)
+        with transaction.atomic():
+            if self.use_copy:
+                self._copy(rows)
+            else:
+                Post.objects.bulk_create(
+                    [Post(**dict(zip(self.COLUMNS, row))) for row in rows],
+                    batch_size=self.batch_size,
+                )
+            CounterService.add_posts(counts)
+            self.save_position(position)
+        self.authors.update(counts)
+        self.imported += len(rows)
+
+    def _copy(self, rows):
+        """Вставка пачки через COPY: в разы быстрее INSERT на больших объемах."""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {Post._meta.db_table} ({', '.join(self.COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+    def run(self, records, start=0, on_batch=None):
+        """
+        Импортирует записи, пропуская первые start уже обработанных.
+
+        После каждой вставленной пачки вызывает on_batch с номером последней
+        обработанной записи, например для вывода прогресса.
+        """
+        batch = []
+        position = start
+        now = timezone.now()
+        for position, record in enumerate(records, 1):
+            if position <= start:
+                continue
+            row = self.build(record, now)
+            if row is None:
+                self.skipped += 1
+                continue
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.insert(batch, position)
+                batch = []
+                now = timezone.now()
+                if on_batch:
+                    on_batch(position)
+        if batch:
+            self.insert(batch, position)
+        else:
+            # Пропущенные записи после последней пачки
+            self.save_position(position)
+        if on_batch:
+            on_batch(position)
+        if self.imported:
+            ResponseCache.invalidate(ResponseCache.POSTS_TAG)
+            AuthorHeaderCache.invalidate(*self.authors)
@@ -0,0 +1,79 @@
+import os
+
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from post import benchmark
+from post.models import Post
+from post.seeding import Seeder
+
+
+class Command(BaseCommand):
+    """
+    Замер производительности основных страниц на синтетических данных.
+
+    Данные создаются в отдельной тестовой базе, с --keepdb она сохраняется
+    между запусками и повторно не заполняется. Результат пишется в JSON,
+    с --compare сравнивается с базовым файлом: при регрессиях команда
+    завершается с ошибкой.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument("--subscriptions", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument("--compare")
+        parser.add_argument("--threshold", type=float, default=0.2)
+        parser.add_argument("--keepdb", action="store_true")
+        parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+
+    def handle(self, *args, **options):
+        baseline = benchmark.load(options["compare"]) if options["compare"] else None
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        for name, result in results["endpoints"].items():
+            self.stdout.write(
+                f"{name:<12} p50 {result['p50_ms']:8.2f} мс  "
+                f"p95 {result['p95_ms']:8.2f} мс  "
+                f"p99 {result['p99_ms']:8.2f} мс  "
+                f"запросов {result['queries']:2}  байт {result['bytes']}"
+            )
+        benchmark.save(results, options["output"])
+        if baseline is None:
+            self.stdout.write(
+                self.style.SUCCESS(f"Результаты сохранены в {options['output']}")
+            )
+            return
+        regressions = benchmark.compare(baseline, results, options["threshold"])
+        for name, metric, previous, current in regressions:
+            self.stdout.write(
+                self.style.ERROR(f"{name}: {metric} {previous} -> {current}")
+            )
+        if regressions:
+            raise CommandError(f"Регрессий: {len(regressions)}")
+        self.stdout.write(self.style.SUCCESS("Регрессий нет"))
+
+    def run(self, options):
+        """Заполняет базу, если данных меньше заданного, и замеряет страницы."""
+        if Post.objects.count() < options["posts"]:
+            self.stdout.write("Заполнение базы синтетическими данными...")
+            Seeder(workers=options["workers"]).run(
+                options["users"], options["posts"], options["subscriptions"]
+            )
+        cache.clear()
+        return benchmark.run(requests=options["requests"], warmup=options["warmup"])
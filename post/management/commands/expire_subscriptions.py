@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from post.services import SubscriptionService
+
+
+class Command(BaseCommand):
+    """Деактивация истекших подписок. Безопасна для запуска по cron."""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        filled = SubscriptionService.fill_end_dates(chunk_size)
+        expired = SubscriptionService.deactivate_expired(chunk_size)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Проставлено дат окончания: {filled}, деактивировано подписок: {expired}"
+            )
+        )
@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+
+from post.models import Post
+from post.thumbnails import ensure_thumbnails
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Создание уменьшенных копий для уже загруженных превью постов и аватаров."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="Пересоздать существующие превью"
+        )
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        sources = (
+            Post.objects.exclude(preview="").exclude(preview__isnull=True),
+            User.objects.exclude(avatar="").exclude(avatar__isnull=True),
+        )
+        for queryset, field in zip(sources, ("preview", "avatar")):
+            for obj in queryset.only("id", field).iterator(chunk_size=500):
+                try:
+                    created += ensure_thumbnails(getattr(obj, field), options["force"])
+                except OSError as error:
+                    failed += 1
+                    self.stderr.write(f"{getattr(obj, field).name}: {error}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Создано превью: {created}, ошибок: {failed}")
+        )
@@ -0,0 +1,56 @@
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from post.importers import PostImporter, read_records
+
+
+class Command(BaseCommand):
+    """
+    Потоковый импорт постов из JSON Lines или CSV.
+
+    Поля записи: title, description, preview, is_free и author_phone или
+    author_email. Номер обработанной записи сохраняется в БД вместе с каждой
+    пачкой, повторный запуск продолжает с него. Контрольная точка по умолчанию
+    названа полным путем к файлу.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("jsonl", "csv"))
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--method", choices=("copy", "bulk"))
+        parser.add_argument("--checkpoint")
+        parser.add_argument("--restart", action="store_true")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError(f"Файл {path} не найден.")
+        file_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "jsonl"
+        )
+        checkpoint = options["checkpoint"] or os.path.abspath(path)
+        use_copy = None if options["method"] is None else options["method"] == "copy"
+
+        importer = PostImporter(options["batch_size"], use_copy, checkpoint)
+        start = 0 if options["restart"] else importer.saved_position()
+        started = time.monotonic()
+
+        def on_batch(position):
+            rate = importer.imported / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"Обработано записей: {position}, импортировано: {importer.imported}, "
+                f"пропущено: {importer.skipped} ({rate:.0f} постов/с)"
+            )
+
+        if start:
+            self.stdout.write(f"Продолжение с записи {start + 1}")
+        importer.run(read_records(path, file_format), start, on_batch)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Импортировано постов: {importer.imported}, "
+                f"пропущено записей: {importer.skipped}"
+            )
+        )
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management import BaseCommand
+
+from post.services import StripeEventService
+
+
+class Command(BaseCommand):
+    """Применение накопленных событий вебхука Stripe к подпискам."""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--loop", action="store_true", help="Работать постоянно, ожидая события"
+        )
+        parser.add_argument("--sleep", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = StripeEventService.process_batch(options["batch_size"])
+            total += processed
+            if processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Обработано событий: {total}"))
@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand, CommandError
+
+from post.profiling import SampleRate
+
+
+class Command(BaseCommand):
+    """
+    Доля запросов, профилируемых сэмплером, без перезапуска воркеров.
+
+    Без аргументов выводит текущую долю, --rate задает ее, --reset
+    возвращает значение PROFILER_SAMPLE_RATE из настроек.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rate", type=float)
+        parser.add_argument("--reset", action="store_true")
+
+    def handle(self, *args, **options):
+        rate = options["rate"]
+        if rate is not None:
+            if not 0 <= rate <= 1:
+                raise CommandError("Доля запросов задается от 0 до 1.")
+            SampleRate.set(rate)
+        elif options["reset"]:
+            SampleRate.clear()
+        self.stdout.write(
+            self.style.SUCCESS(f"Доля профилируемых запросов: {SampleRate.get():g}")
+        )
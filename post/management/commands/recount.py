@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from post.services import CounterService
+
+
+class Command(BaseCommand):
+    """Сверка счетчиков постов и подписок пользователей с фактическими данными."""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for field in CounterService.USER_COUNTERS:
+            fixed = CounterService.recount(field, options["batch_size"])
+            self.stdout.write(
+                self.style.SUCCESS(f"{field}: исправлено счетчиков: {fixed}")
+            )
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from post.checks import PROCESS_LOCAL_CACHES
+from post.services import ResponseCache
+
+
+class Command(BaseCommand):
+    """
+    Вывод счетчиков попаданий и промахов кеша страниц для анонимных посетителей.
+
+    Счетчики хранятся в кеше, поэтому видны команде только с общим кешем.
+    Независимо от кеша они отдаются по воркерам в /metrics.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true")
+
+    def handle(self, *args, **options):
+        if settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Кеш не общий для процессов: счетчики веб-воркеров команде "
+                    "не видны, смотрите django_view_response_cache_*_total в /metrics"
+                )
+            )
+        stats = ResponseCache.stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+                f"доля попаданий: {stats['hit_ratio']:.1%}"
+            )
+        )
+        if options["reset"]:
+            ResponseCache.reset_stats()
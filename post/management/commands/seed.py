@@ -0,0 +1,72 @@
+import os
+import time
+from collections import Counter
+
+from django.core.management import BaseCommand, CommandError
+
+from post.seeding import Seeder
+
+
+class Command(BaseCommand):
+    """
+    Генерация синтетических пользователей, постов и подписок для нагрузочного тестирования.
+
+    Данные добавляются к уже существующим. Посты вставляются в --workers
+    процессов. Все пользователи получают пароль --password.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--subscriptions", type=int, default=500)
+        parser.add_argument("--author-share", type=float, default=0.1)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--password", default=Seeder.PASSWORD)
+
+    def handle(self, *args, **options):
+        if options["users"] < 1:
+            raise CommandError("Нужен хотя бы один пользователь.")
+        seeder = Seeder(
+            batch_size=options["batch_size"],
+            author_share=options["author_share"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+            password=options["password"],
+            workers=options["workers"],
+        )
+        started = time.monotonic()
+        authors, post_authors, subscribers = seeder.plan(
+            options["users"], options["posts"], options["subscriptions"]
+        )
+        user_ids = self.stage(
+            "Пользователи",
+            lambda: seeder.create_users(
+                options["users"],
+                authors,
+                Counter(post_authors),
+                Counter(subscribers),
+            ),
+        )
+        self.stage(
+            "Посты", lambda: seeder.create_posts_parallel(user_ids, post_authors)
+        )
+        self.stage(
+            "Подписки", lambda: seeder.create_subscriptions(user_ids, subscribers)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово за {time.monotonic() - started:.1f} с")
+        )
+
+    def stage(self, name, create):
+        """Выполняет этап генерации и выводит его скорость."""
+        started = time.monotonic()
+        created = create()
+        count = created if isinstance(created, int) else len(created)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"{name}: {count} за {elapsed:.1f} с ({count / elapsed:.0f} в секунду)"
+        )
+        return created
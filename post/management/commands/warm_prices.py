@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from post.services import PriceCatalog
+
+
+class Command(BaseCommand):
+    """Создание цен Stripe для всех тарифов подписки заранее."""
+
+    def handle(self, *args, **options):
+        count = PriceCatalog.warm()
+        self.stdout.write(self.style.SUCCESS(f"Цен в каталоге: {count}"))
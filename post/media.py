@@ -0,0 +1,102 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+CHUNK_SIZE = 64 * 1024
+
+
+def media_response(request, name, full_path, cache_control):
+    """
+    Ответ с медиафайлом.
+
+    Сам файл отдает фронтовой веб-сервер по заголовку X-Accel-Redirect (nginx)
+    или X-Sendfile (Apache, lighttpd), если задан MEDIA_ACCEL_BACKEND. Иначе
+    файл отдает Django с поддержкой Range, что годится для разработки.
+    Условные запросы обрабатываются в обоих случаях.
+    """
+    stat = os.stat(full_path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or "application/octet-stream"
+        if settings.MEDIA_ACCEL_BACKEND == "nginx":
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        elif settings.MEDIA_ACCEL_BACKEND == "sendfile":
+            response = HttpResponse(content_type=content_type)
+            response["X-Sendfile"] = full_path
+        else:
+            response = _file_response(request, full_path, stat.st_size, etag)
+            response["Content-Type"] = content_type
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = cache_control
+    return response
+
+
+def _file_response(request, full_path, size, etag):
+    """Отдает файл целиком или запрошенный диапазон байт."""
+    first_last = _requested_range(request, size, etag)
+    if first_last is None:
+        response = FileResponse(open(full_path, "rb"))
+    elif first_last is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    else:
+        first, last = first_last
+        response = StreamingHttpResponse(
+            _read_range(full_path, first, last - first + 1), status=206
+        )
+        response["Content-Range"] = f"bytes {first}-{last}/{size}"
+        response["Content-Length"] = str(last - first + 1)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _requested_range(request, size, etag):
+    """
+    Разбирает заголовок Range с одним диапазоном.
+
+    Возвращает (first, last), None, если нужно отдать файл целиком,
+    или False, если диапазон невыполним.
+    """
+    match = RANGE_RE.fullmatch(request.headers.get("Range", "").strip())
+    if match is None or not any(match.groups()):
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        return None
+
+    start, end = match.groups()
+    if start:
+        first = int(start)
+        last = min(int(end), size - 1) if end else size - 1
+    else:
+        first, last = max(size - int(end), 0), size - 1
+    if first > last or first >= size:
+        return False
+    return first, last
+
+
+def _read_range(full_path, offset, length):
+    """Читает length байт файла начиная с offset порциями по CHUNK_SIZE."""
+    with open(full_path, "rb") as file:
+        file.seek(offset)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
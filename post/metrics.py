@@ -0,0 +1,427 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from post.services import SlowRequestService
+
+# Границы корзин гистограммы времени ответа, в секундах
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNRESOLVED_VIEW = "<unresolved>"
+
+logger = logging.getLogger(__name__)
+
+_request_stats = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    """
+    Счетчики текущего запроса: SQL-запросы и отрисовка шаблонов.
+
+    Если передан limit, запоминаются и сами SQL-запросы (не больше limit)
+    для сохранения медленного запроса.
+    """
+
+    __slots__ = (
+        "queries",
+        "query_seconds",
+        "template_seconds",
+        "rendering",
+        "statements",
+        "limit",
+    )
+
+    def __init__(self, limit=0):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+        self.rendering = False
+        self.statements = [] if limit else None
+        self.limit = limit
+
+
+def current_stats():
+    """Счетчики запроса, который сейчас обрабатывается, или None."""
+    return _request_stats.get()
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Обертка выполнения SQL, считающая запросы и их время для текущего запроса.
+
+    Ставится на каждое подключение к БД. Вне запроса только проверяет
+    контекстную переменную, поэтому команды и фоновые задачи не замедляет.
+    """
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.query_seconds += elapsed
+        if stats.statements is not None and len(stats.statements) < stats.limit:
+            stats.statements.append(
+                (sql, None if many else params, elapsed, context["connection"].alias)
+            )
+
+
+def install_query_timer(connection):
+    """Добавляет учет SQL-запросов в подключение, если его там еще нет."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+class TimedTemplate(Template):
+    """Шаблон, время отрисовки которого учитывается в метриках запроса."""
+
+    def render(self, context=None, request=None):
+        stats = _request_stats.get()
+        # Вложенные шаблоны (render_to_string из тегов) уже входят во внешний
+        if stats is None or stats.rendering:
+            return super().render(context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+            stats.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django с учетом времени отрисовки."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def _new_view():
+    return {
+        "requests": {},
+        "buckets": [0] * (len(DURATION_BUCKETS) + 1),
+        "duration_seconds": 0.0,
+        "queries": 0,
+        "query_seconds": 0.0,
+        "template_seconds": 0.0,
+        "response_bytes": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+    }
+
+
+def _merge(target, source):
+    """Складывает агрегаты source в target."""
+    for view, data in source.items():
+        merged = target.setdefault(view, _new_view())
+        for status, count in data["requests"].items():
+            merged["requests"][status] = merged["requests"].get(status, 0) + count
+        merged["buckets"] = [a + b for a, b in zip(merged["buckets"], data["buckets"])]
+        for key in (
+            "duration_seconds",
+            "queries",
+            "query_seconds",
+            "template_seconds",
+            "response_bytes",
+            "cache_hits",
+            "cache_misses",
+        ):
+            # Файлы прежних версий могут не содержать новых счетчиков
+            merged[key] += data.get(key, 0)
+    return target
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    Агрегаты метрик по контроллерам в памяти процесса.
+
+    Если задан METRICS_DIR, фоновый поток раз в METRICS_FLUSH_INTERVAL
+    секунд и процесс при завершении сбрасывают агрегаты в свой файл
+    metrics-<pid>-<uuid>.json, а выдача складывает файлы всех процессов
+    (воркеров gunicorn). Простаивающий воркер тоже отдает последние запросы,
+    а воркер с повторно выданным pid не перезаписывает файл завершенного.
+    Файлы завершенных воркеров остаются, чтобы счетчики не уменьшались;
+    каталог очищают при перезапуске приложения.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flusher = None
+        self.reset()
+        atexit.register(self.flush_pending)
+
+    def reset(self):
+        """Обнуляет агрегаты процесса."""
+        with self.lock:
+            self.start_process()
+
+    def start_process(self):
+        """Начинает агрегаты заново под новым идентификатором процесса."""
+        self.pid = os.getpid()
+        self.process_id = f"{self.pid}-{uuid.uuid4().hex}"
+        self.views = {}
+        self.dirty = False
+
+    def check_fork(self):
+        """После fork агрегаты родителя не должны попасть в файл воркера."""
+        if self.pid != os.getpid():
+            self.start_process()
+
+    def observe(self, view, status, duration, stats, size, cache_result=None):
+        """Учитывает обработанный запрос и результат кеша ответов (HIT или MISS)."""
+        with self.lock:
+            self.check_fork()
+            data = self.views.get(view)
+            if data is None:
+                data = self.views[view] = _new_view()
+            status = str(status)
+            data["requests"][status] = data["requests"].get(status, 0) + 1
+            data["buckets"][bisect_left(DURATION_BUCKETS, duration)] += 1
+            data["duration_seconds"] += duration
+            data["queries"] += stats.queries
+            data["query_seconds"] += stats.query_seconds
+            data["template_seconds"] += stats.template_seconds
+            data["response_bytes"] += size
+            if cache_result == "HIT":
+                data["cache_hits"] += 1
+            elif cache_result == "MISS":
+                data["cache_misses"] += 1
+            self.dirty = True
+        if settings.METRICS_DIR and (
+            self.flusher is None or not self.flusher.is_alive()
+        ):
+            self.start_flusher()
+
+    def start_flusher(self):
+        """Запускает поток сброса агрегатов (после fork его нужно запустить заново)."""
+        with self.lock:
+            if self.flusher is None or not self.flusher.is_alive():
+                self.flusher = threading.Thread(
+                    target=self.flush_periodically, name="metrics-flusher", daemon=True
+                )
+                self.flusher.start()
+
+    def flush_periodically(self):
+        """Сбрасывает агрегаты раз в METRICS_FLUSH_INTERVAL секунд."""
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush_pending()
+
+    def flush_pending(self):
+        """Сбрасывает агрегаты, если после прошлого сброса были запросы."""
+        directory = settings.METRICS_DIR
+        if not directory or not self.dirty or self.pid != os.getpid():
+            return
+        try:
+            self.flush(directory)
+        except OSError:
+            logger.exception("Не удалось сохранить метрики в %s", directory)
+
+    def snapshot(self):
+        """Копия агрегатов процесса."""
+        with self.lock:
+            return json.loads(json.dumps(self.views))
+
+    def flush(self, directory):
+        """Атомарно записывает агрегаты процесса в его файл."""
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            self.check_fork()
+            data = json.dumps(self.views)
+            name = f"metrics-{self.process_id}.json"
+            self.dirty = False
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            file.write(data)
+        os.replace(temporary, os.path.join(directory, name))
+
+    def collect(self):
+        """Агрегаты всех процессов или только текущего без METRICS_DIR."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+        self.flush(directory)
+        views = {}
+        for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    _merge(views, json.load(file))
+            except (OSError, ValueError):
+                continue
+        return views
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        views = self.collect()
+        lines = []
+
+        def family(name, kind, description):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family("django_view_requests_total", "counter", "Число запросов.")
+        for view, data in sorted(views.items()):
+            for status, count in sorted(data["requests"].items()):
+                lines.append(
+                    f'django_view_requests_total{{view="{_escape(view)}",'
+                    f'status="{status}"}} {count}'
+                )
+        family("django_view_request_duration_seconds", "histogram", "Время ответа.")
+        for view, data in sorted(views.items()):
+            label = f'view="{_escape(view)}"'
+            total = 0
+            for bound, count in zip((*DURATION_BUCKETS, "+Inf"), data["buckets"]):
+                total += count
+                lines.append(
+                    f"django_view_request_duration_seconds_bucket"
+                    f'{{{label},le="{bound}"}} {total}'
+                )
+            lines.append(
+                f"django_view_request_duration_seconds_sum{{{label}}} "
+                f"{data['duration_seconds']:.6f}"
+            )
+            lines.append(
+                f"django_view_request_duration_seconds_count{{{label}}} {total}"
+            )
+        for name, key, description in (
+            ("django_view_db_queries_total", "queries", "Число SQL-запросов."),
+            (
+                "django_view_db_query_seconds_total",
+                "query_seconds",
+                "Время SQL-запросов.",
+            ),
+            (
+                "django_view_template_render_seconds_total",
+                "template_seconds",
+                "Время отрисовки шаблонов.",
+            ),
+            (
+                "django_view_response_bytes_total",
+                "response_bytes",
+                "Размер ответов.",
+            ),
+            (
+                "django_view_response_cache_hits_total",
+                "cache_hits",
+                "Ответы из кеша страниц для анонимных посетителей.",
+            ),
+            (
+                "django_view_response_cache_misses_total",
+                "cache_misses",
+                "Промахи кеша страниц для анонимных посетителей.",
+            ),
+        ):
+            family(name, "counter", description)
+            for view, data in sorted(views.items()):
+                value = data.get(key, 0)
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f'{name}{{view="{_escape(view)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def new_stats():
+    """Счетчики нового запроса, с запоминанием SQL при включенном сохранении медленных."""
+    capture = settings.SLOW_REQUEST_THRESHOLD_MS or settings.SLOW_QUERY_THRESHOLD_MS
+    return RequestStats(settings.SLOW_REQUEST_MAX_STATEMENTS if capture else 0)
+
+
+def view_name(request):
+    """Имя маршрута запроса или UNRESOLVED_VIEW."""
+    match = request.resolver_match
+    return match.view_name if match else UNRESOLVED_VIEW
+
+
+class MetricsMiddleware:
+    """
+    Сбор метрик по имени маршрута: число запросов, время ответа, SQL-запросы,
+    отрисовка шаблонов и размер ответа.
+
+    Ставится первой в MIDDLEWARE, чтобы учитывать время остальных. Медленные
+    запросы сохраняет SlowRequestService, если задан SLOW_REQUEST_THRESHOLD_MS.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = new_stats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        duration = time.perf_counter() - started
+        self.observe(request, response, stats, duration)
+        if SlowRequestService.is_slow(stats, duration):
+            SlowRequestService.capture(
+                view_name(request), request, response, stats, duration
+            )
+        return response
+
+    async def __acall__(self, request):
+        stats = new_stats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        duration = time.perf_counter() - started
+        self.observe(request, response, stats, duration)
+        if SlowRequestService.is_slow(stats, duration):
+            await sync_to_async(SlowRequestService.capture)(
+                view_name(request), request, response, stats, duration
+            )
+        return response
+
+    @staticmethod
+    def observe(request, response, stats, duration):
+        """Передает измерения запроса в реестр метрик."""
+        if response.streaming:
+            size = int(response.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+        registry.observe(
+            view_name(request),
+            response.status_code,
+            duration,
+            stats,
+            size,
+            response.get("X-Cache"),
+        )
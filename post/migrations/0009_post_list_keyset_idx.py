@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0008_post_is_free_post_preview"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-is_free", "title", "id"], name="post_list_keyset_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0009_post_list_keyset_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StripePrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "type_of_sub",
+                    models.CharField(
+                        choices=[
+                            ("one_month", "1 месяц"),
+                            ("three_month", "3 месяца"),
+                            ("six_month", "6 месяцев"),
+                            ("one_year", "1 год"),
+                        ],
+                        max_length=20,
+                        verbose_name="Тип подписки",
+                    ),
+                ),
+                ("amount", models.PositiveIntegerField(verbose_name="Сумма, USD")),
+                (
+                    "interval",
+                    models.PositiveSmallIntegerField(verbose_name="Интервал, месяцев"),
+                ),
+                (
+                    "price_id",
+                    models.CharField(max_length=100, verbose_name="Идентификатор цены"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Цена Stripe",
+                "verbose_name_plural": "Цены Stripe",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("type_of_sub", "amount", "interval"),
+                        name="unique_stripe_price",
+                    )
+                ],
+            },
+        ),
+    ]
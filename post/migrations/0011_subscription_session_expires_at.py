@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0010_stripeprice"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="session_expires_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Срок действия сессии оплаты"
+            ),
+        ),
+    ]
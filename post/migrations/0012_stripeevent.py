@@ -0,0 +1,61 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0011_subscription_session_expires_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="subscription",
+            name="session_id",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=150,
+                null=True,
+                verbose_name="Номер сессии",
+            ),
+        ),
+        migrations.CreateModel(
+            name="StripeEvent",
+            fields=[
+                (
+                    "event_id",
+                    models.CharField(
+                        max_length=255,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Идентификатор события",
+                    ),
+                ),
+                ("type", models.CharField(max_length=100, verbose_name="Тип события")),
+                ("payload", models.JSONField(verbose_name="Данные события")),
+                (
+                    "received_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Получено"),
+                ),
+                (
+                    "processed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Обработано"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие Stripe",
+                "verbose_name_plural": "События Stripe",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["received_at"],
+                        name="stripe_event_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0013_sub_active_end_date_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["preview"],
+                name="post_preview_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0016_post_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата создания",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["updated_at"], name="post_updated_at_idx"),
+        ),
+    ]
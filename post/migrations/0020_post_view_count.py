@@ -0,0 +1,43 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0019_post_author_id_idx"),
+        ("users", "0007_user_post_count_user_subscription_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="view_count",
+            field=models.PositiveIntegerField(
+                db_default=0, default=0, editable=False, verbose_name="Просмотры"
+            ),
+        ),
+        # Начальные значения счетчиков пользователей по уже существующим данным
+        migrations.RunSQL(
+            """
+            UPDATE users_user SET post_count = counts.total
+            FROM (
+                SELECT author_id, COUNT(*) AS total FROM post_post GROUP BY author_id
+            ) AS counts
+            WHERE users_user.id = counts.author_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE users_user SET subscription_count = counts.total
+            FROM (
+                SELECT user_id, COUNT(*) AS total FROM post_subscription
+                WHERE user_id IS NOT NULL GROUP BY user_id
+            ) AS counts
+            WHERE users_user.id = counts.user_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
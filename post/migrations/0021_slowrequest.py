@@ -0,0 +1,61 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0020_post_view_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SlowRequest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Время"),
+                ),
+                ("method", models.CharField(max_length=10, verbose_name="Метод")),
+                ("path", models.CharField(max_length=500, verbose_name="Адрес")),
+                (
+                    "view_name",
+                    models.CharField(max_length=200, verbose_name="Контроллер"),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(verbose_name="Код ответа"),
+                ),
+                ("duration_ms", models.FloatField(verbose_name="Время ответа, мс")),
+                (
+                    "query_count",
+                    models.PositiveIntegerField(verbose_name="SQL-запросов"),
+                ),
+                ("query_ms", models.FloatField(verbose_name="Время SQL, мс")),
+                (
+                    "statements",
+                    models.JSONField(default=list, verbose_name="SQL-запросы"),
+                ),
+            ],
+            options={
+                "verbose_name": "Медленный запрос",
+                "verbose_name_plural": "Медленные запросы",
+                "indexes": [
+                    models.Index(
+                        fields=["view_name", "-duration_ms"],
+                        name="slow_request_view_idx",
+                    )
+                ],
+            },
+        ),
+    ]
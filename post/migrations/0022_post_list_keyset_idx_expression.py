@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0021_slowrequest"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="post",
+            name="post_list_keyset_idx",
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                models.ExpressionWrapper(
+                    models.Q(("is_free", False)), output_field=models.BooleanField()
+                ),
+                models.F("title"),
+                models.F("id"),
+                name="post_list_keyset_idx",
+            ),
+        ),
+    ]
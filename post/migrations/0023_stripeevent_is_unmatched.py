@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0022_post_list_keyset_idx_expression"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stripeevent",
+            name="is_unmatched",
+            field=models.BooleanField(
+                default=False, verbose_name="Оплата без подписки"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0023_stripeevent_is_unmatched"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=500,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Источник импорта",
+                    ),
+                ),
+                (
+                    "position",
+                    models.PositiveBigIntegerField(verbose_name="Обработано записей"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+            ],
+            options={
+                "verbose_name": "Контрольная точка импорта",
+                "verbose_name_plural": "Контрольные точки импорта",
+            },
+        ),
+    ]
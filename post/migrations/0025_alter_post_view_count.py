@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:18
+
+from django.db import migrations
+
+import common.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0024_importcheckpoint"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="post",
+            name="view_count",
+            field=common.fields.CounterField(
+                db_default=0, default=0, editable=False, verbose_name="Просмотры"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0025_alter_post_view_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # AlterField пересоздал бы внешний ключ с проверкой всей таблицы,
+        # поэтому в БД удаляется только индекс
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="post",
+                    name="author",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Автор",
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX IF EXISTS "post_post_author_id_99d134d5"',
+                    'CREATE INDEX IF NOT EXISTS "post_post_author_id_99d134d5" '
+                    'ON "post_post" ("author_id")',
+                ),
+            ],
+        ),
+    ]
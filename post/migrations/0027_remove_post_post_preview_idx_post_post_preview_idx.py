@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0026_alter_post_author"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="post",
+            name="post_preview_idx",
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["preview"], name="post_preview_idx"),
+        ),
+    ]
@@ -1,20 +1,66 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 
+from common.fields import CounterField
 from users.models import User
 
+# Пост только для подписчиков. Списки постов сортируются по нему по
+# возрастанию (сначала бесплатные): выражение совпадает с индексом
+# post_list_keyset_idx, чтобы курсор сравнивал строки по индексу
+NOT_FREE = models.ExpressionWrapper(
+    models.Q(is_free=False), output_field=models.BooleanField()
+)
+
 
 class Post(models.Model):
-    author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Автор")
+    # Отдельный индекс по автору не нужен: его покрывают составные индексы
+    # post_author_created_idx и post_author_id_idx, начинающиеся с author_id
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, db_index=False, verbose_name="Автор"
+    )
     title = models.CharField(max_length=150, verbose_name="Заголовок")
     description = models.TextField(verbose_name="Описание", blank=True, null=True)
     preview = models.ImageField(
         upload_to="post/preview", verbose_name="Превью поста", blank=True, null=True
     )
     is_free = models.BooleanField(verbose_name="Доступно бесплатно", default=False)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    view_count = CounterField(
+        default=0, db_default=0, editable=False, verbose_name="Просмотры"
+    )
+    # Поисковый вектор по заголовку и описанию, PostgreSQL пересчитывает его сам
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", config="russian", weight="A")
+            + SearchVector("title", config="english", weight="A")
+            + SearchVector("description", config="russian", weight="B")
+            + SearchVector("description", config="english", weight="B")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+        indexes = [
+            models.Index(
+                NOT_FREE, models.F("title"), models.F("id"), name="post_list_keyset_idx"
+            ),
+            # Проверка доступа к медиафайлу: посты с этим превью, preview = %s
+            models.Index(fields=["preview"], name="post_preview_idx"),
+            GinIndex(fields=["search_vector"], name="post_search_idx"),
+            # Валидатор списков постов: max(updated_at) читается из индекса
+            models.Index(fields=["updated_at"], name="post_updated_at_idx"),
+            # Число постов и последний пост автора без обхода всех его постов
+            models.Index(
+                fields=["author", "-created_at"], name="post_author_created_idx"
+            ),
+            # Лента постов автора от новых к старым
+            models.Index(fields=["author", "-id"], name="post_author_id_idx"),
+        ]
 
 
 class Subscription(models.Model):
@@ -42,11 +88,18 @@ class Subscription(models.Model):
     is_paid = models.BooleanField(default=False)
 
     session_id = models.CharField(
-        max_length=150, verbose_name="Номер сессии", blank=True, null=True
+        max_length=150,
+        verbose_name="Номер сессии",
+        blank=True,
+        null=True,
+        db_index=True,
     )
     link = models.URLField(
         max_length=450, verbose_name="Ссылка на оплату", blank=True, null=True
     )
+    session_expires_at = models.DateTimeField(
+        verbose_name="Срок действия сессии оплаты", blank=True, null=True
+    )
 
     def get_price(self):
         price = {
@@ -63,3 +116,115 @@ class Subscription(models.Model):
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        indexes = [
+            models.Index(
+                fields=["end_date"],
+                name="sub_active_end_date_idx",
+                condition=models.Q(is_active=True),
+            ),
+        ]
+
+
+class StripePrice(models.Model):
+    """Цена в Stripe, созданная один раз для сочетания тарифа, суммы и интервала."""
+
+    type_of_sub = models.CharField(
+        max_length=20, choices=Subscription.SUB_CHOICES, verbose_name="Тип подписки"
+    )
+    amount = models.PositiveIntegerField(verbose_name="Сумма, USD")
+    interval = models.PositiveSmallIntegerField(verbose_name="Интервал, месяцев")
+    price_id = models.CharField(max_length=100, verbose_name="Идентификатор цены")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    def __str__(self):
+        return f"{self.type_of_sub} - {self.amount} USD - {self.price_id}"
+
+    class Meta:
+        verbose_name = "Цена Stripe"
+        verbose_name_plural = "Цены Stripe"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["type_of_sub", "amount", "interval"],
+                name="unique_stripe_price",
+            ),
+        ]
+
+
+class StripeEvent(models.Model):
+    """Входящее событие вебхука Stripe, ожидающее обработки."""
+
+    event_id = models.CharField(
+        max_length=255, primary_key=True, verbose_name="Идентификатор события"
+    )
+    type = models.CharField(max_length=100, verbose_name="Тип события")
+    payload = models.JSONField(verbose_name="Данные события")
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Получено")
+    processed_at = models.DateTimeField(
+        verbose_name="Обработано", blank=True, null=True
+    )
+    is_unmatched = models.BooleanField(
+        default=False, verbose_name="Оплата без подписки"
+    )
+
+    def __str__(self):
+        return f"{self.type} - {self.event_id}"
+
+    class Meta:
+        verbose_name = "Событие Stripe"
+        verbose_name_plural = "События Stripe"
+        indexes = [
+            models.Index(
+                fields=["received_at"],
+                name="stripe_event_pending_idx",
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Контрольная точка импорта постов: номер последней обработанной записи.
+
+    Сохраняется в транзакции вставленной пачки, поэтому после сбоя импорт
+    продолжается ровно с первой невставленной записи.
+    """
+
+    name = models.CharField(
+        max_length=500, primary_key=True, verbose_name="Источник импорта"
+    )
+    position = models.PositiveBigIntegerField(verbose_name="Обработано записей")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    def __str__(self):
+        return f"{self.name} - {self.position}"
+
+    class Meta:
+        verbose_name = "Контрольная точка импорта"
+        verbose_name_plural = "Контрольные точки импорта"
+
+
+class SlowRequest(models.Model):
+    """Медленный запрос с его SQL-запросами, сгруппированными по шаблону."""
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время")
+    method = models.CharField(max_length=10, verbose_name="Метод")
+    path = models.CharField(max_length=500, verbose_name="Адрес")
+    view_name = models.CharField(max_length=200, verbose_name="Контроллер")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Код ответа")
+    duration_ms = models.FloatField(verbose_name="Время ответа, мс")
+    query_count = models.PositiveIntegerField(verbose_name="SQL-запросов")
+    query_ms = models.FloatField(verbose_name="Время SQL, мс")
+    # Шаблоны запросов без значений параметров: sql, count, total_ms, max_ms, plan
+    statements = models.JSONField(default=list, verbose_name="SQL-запросы")
+
+    def __str__(self):
+        return f"{self.method} {self.path} - {self.duration_ms:.0f} мс"
+
+    class Meta:
+        verbose_name = "Медленный запрос"
+        verbose_name_plural = "Медленные запросы"
+        indexes = [
+            models.Index(
+                fields=["view_name", "-duration_ms"], name="slow_request_view_idx"
+            ),
+        ]
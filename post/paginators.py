@@ -0,0 +1,196 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import F, Field, Func, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from django.http import Http404
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPage:
+    """Страница курсорной пагинации."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        """Есть ли следующая страница."""
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        """Есть ли предыдущая страница."""
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        """Есть ли другие страницы помимо текущей."""
+        return self.has_next() or self.has_previous()
+
+
+class Row(Func):
+    """Строка значений (a, b, c) для сравнения кортежей в SQL."""
+
+    function = ""
+    template = "(%(expressions)s)"
+    output_field = Field()
+
+
+class KeysetPaginator:
+    """
+    Курсорная (keyset) пагинация по составной сортировке.
+
+    Вместо OFFSET страница отбирается сравнением строк
+    (a, b, id) > (%s, %s, %s): PostgreSQL использует его как условие
+    индекса (Index Cond) по тем же полям, поэтому глубокие страницы стоят
+    столько же, сколько первая. Все поля сортировки должны идти в одном
+    направлении (поле в обратном порядке заменяют выражением в аннотации
+    и индексе), последнее поле должно быть уникальным (обычно id).
+    """
+
+    NEXT = "n"
+    PREVIOUS = "p"
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        if len({field.startswith("-") for field in self.ordering}) > 1:
+            raise ImproperlyConfigured(
+                "Поля курсорной пагинации должны сортироваться в одном направлении."
+            )
+
+    def encode_cursor(self, obj, direction):
+        """Кодирует граничную запись страницы в строку курсора."""
+        values = [getattr(obj, field.lstrip("-")) for field in self.ordering]
+        payload = json.dumps([direction, values], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """Декодирует строку курсора в направление и значения полей сортировки."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+        except (binascii.Error, ValueError, TypeError):
+            raise Http404("Неверный курсор страницы.")
+        if direction not in (self.NEXT, self.PREVIOUS) or not isinstance(values, list):
+            raise Http404("Неверный курсор страницы.")
+        if len(values) != len(self.ordering):
+            raise Http404("Неверный курсор страницы.")
+        return direction, [
+            self.clean_value(field, value)
+            for field, value in zip(self.ordering, values)
+        ]
+
+    def clean_value(self, field, value):
+        """Приводит значение из курсора к типу поля сортировки."""
+        if not isinstance(value, (bool, int, float, str)):
+            raise Http404("Неверный курсор страницы.")
+        name = field.lstrip("-")
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            model_field = annotation.output_field
+        else:
+            model_field = self.queryset.model._meta.get_field(name)
+        try:
+            return model_field.to_python(value)
+        except ValidationError:
+            raise Http404("Неверный курсор страницы.")
+
+    def _ordering(self, reverse):
+        """Возвращает сортировку, при необходимости развернутую."""
+        if not reverse:
+            return self.ordering
+        return tuple(
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        )
+
+    def _seek_filter(self, values, reverse):
+        """Условие выборки записей, идущих после граничной: сравнение строк."""
+        descending = self.ordering[0].startswith("-") != reverse
+        lookup = LessThan if descending else GreaterThan
+        return lookup(
+            Row(*(F(field.lstrip("-")) for field in self.ordering)),
+            Row(*(Value(value) for value in values)),
+        )
+
+    def paginate(self, cursor=None):
+        """Возвращает страницу, на которую указывает курсор."""
+        direction, values = self.NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        reverse = direction == self.PREVIOUS
+
+        queryset = self.queryset.order_by(*self._ordering(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, reverse))
+
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows)
+
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else values is not None
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], self.NEXT) if has_next else None,
+            previous_cursor=(
+                self.encode_cursor(rows[0], self.PREVIOUS) if has_previous else None
+            ),
+        )
+
+
+class KeysetPaginationMixin:
+    """Курсорная пагинация для ListView: размер страницы из page_size, курсор из cursor."""
+
+    max_paginate_by = 100
+    cursor_kwarg = "cursor"
+    page_size_kwarg = "page_size"
+
+    def get_paginate_by(self, queryset):
+        """Размер страницы из параметра page_size, но не больше max_paginate_by."""
+        try:
+            page_size = int(self.request.GET[self.page_size_kwarg])
+        except (KeyError, ValueError):
+            return self.paginate_by
+        return min(max(page_size, 1), self.max_paginate_by)
+
+    def paginate_queryset(self, queryset, page_size):
+        """Отбирает страницу по курсору вместо OFFSET."""
+        paginator = KeysetPaginator(queryset, self.ordering, page_size)
+        page = paginator.paginate(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class SearchPagination(PageNumberPagination):
+    """Постраничная выдача результатов поиска в API."""
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class PostCursorPagination(CursorPagination):
+    """Курсорная выдача постов в API, от новых к старым."""
+
+    ordering = "-id"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
@@ -0,0 +1,229 @@
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+CONTROL_FILE = "sample_rate"
+PROFILE_SUFFIX = ".collapsed"
+UNSAFE_NAME_RE = re.compile(r"[^\w.-]+")
+
+logger = logging.getLogger(__name__)
+
+
+class Sampler(threading.Thread):
+    """
+    Статистический профилировщик: раз в interval секунд снимает стек потоков.
+
+    Результат - число попаданий каждого стека в формате collapsed stacks
+    ("модуль:функция;модуль:функция N"), который понимают flamegraph.pl
+    и speedscope. Без thread_id снимаются все потоки, кроме самого сэмплера.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def frame_name(frame):
+        """Имя кадра стека: модуль и полное имя функции."""
+        code = frame.f_code
+        return f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+
+    def sample(self):
+        """Снимает стеки отслеживаемых потоков."""
+        frames = sys._current_frames()
+        if self.thread_id is not None:
+            frames = {self.thread_id: frames.get(self.thread_id)}
+        for thread_id, frame in frames.items():
+            if frame is None or thread_id == self.ident:
+                continue
+            names = []
+            while frame is not None:
+                names.append(self.frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def run(self):
+        """Снимает стеки до остановки."""
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        """Останавливает сэмплер и возвращает собранные стеки."""
+        self.stopped.set()
+        self.join()
+        return self.stacks
+
+
+class SampleRate:
+    """
+    Доля запросов, профилируемых случайно.
+
+    Значение берется из файла PROFILES_DIR/sample_rate (его пишет команда
+    profiling), а без файла - из PROFILER_SAMPLE_RATE. Файл перечитывается
+    не чаще раза в PROFILER_RELOAD_INTERVAL секунд, поэтому частоту можно
+    менять без перезапуска воркеров.
+    """
+
+    rate = None
+    checked_at = 0.0
+
+    @classmethod
+    def path(cls):
+        """Путь к файлу с долей профилируемых запросов."""
+        return os.path.join(settings.PROFILES_DIR, CONTROL_FILE)
+
+    @classmethod
+    def get(cls):
+        """Текущая доля профилируемых запросов."""
+        now = time.monotonic()
+        if (
+            cls.rate is None
+            or now - cls.checked_at >= settings.PROFILER_RELOAD_INTERVAL
+        ):
+            cls.checked_at = now
+            try:
+                with open(cls.path(), encoding="utf-8") as file:
+                    cls.rate = float(file.read().strip() or 0)
+            except (OSError, ValueError):
+                cls.rate = settings.PROFILER_SAMPLE_RATE
+        return cls.rate
+
+    @classmethod
+    def set(cls, rate):
+        """Сохраняет долю профилируемых запросов для всех воркеров."""
+        os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+        temporary = f"{cls.path()}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(f"{rate}\n")
+        os.replace(temporary, cls.path())
+        cls.rate = None
+
+    @classmethod
+    def clear(cls):
+        """Удаляет файл с долей: снова действует PROFILER_SAMPLE_RATE."""
+        try:
+            os.remove(cls.path())
+        except FileNotFoundError:
+            pass
+        cls.rate = None
+
+
+def prune_profiles(directory, keep):
+    """Удаляет профили, кроме keep последних. Имена начинаются с даты и времени."""
+    profiles = sorted(
+        entry.name
+        for entry in os.scandir(directory)
+        if entry.name.endswith(PROFILE_SUFFIX)
+    )
+    for name in profiles[: max(0, len(profiles) - keep)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            # Его уже удалил другой воркер
+            pass
+
+
+def save_profile(request, stacks, duration):
+    """
+    Записывает стеки запроса в PROFILES_DIR и возвращает имя файла.
+
+    Хранятся только PROFILER_KEEP последних профилей.
+    """
+    match = request.resolver_match
+    view = UNSAFE_NAME_RE.sub("_", match.view_name if match else "unresolved")
+    name = (
+        f"{timezone.now():%Y%m%d-%H%M%S}-{view}-{os.getpid()}-"
+        f"{duration * 1000:.0f}ms{PROFILE_SUFFIX}"
+    )
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    with open(os.path.join(settings.PROFILES_DIR, name), "w", encoding="utf-8") as file:
+        for stack, count in stacks.most_common():
+            file.write(f"{stack} {count}\n")
+    prune_profiles(settings.PROFILES_DIR, settings.PROFILER_KEEP)
+    return name
+
+
+class ProfilerMiddleware:
+    """
+    Профилирование отдельных запросов статистическим сэмплером.
+
+    Запрос профилируется, если его отправил персонал с заголовком
+    X-Profile: 1 или параметром ?profile=1 (имя файла возвращается
+    в заголовке X-Profile-File), либо случайно с долей SampleRate.
+    Ставится после AuthenticationMiddleware. В асинхронном режиме снимаются
+    все потоки: цикл событий обслуживает и другие запросы.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def requested(request):
+        """Запросил ли профилирование сотрудник."""
+        flag = request.headers.get("X-Profile") or request.GET.get("profile")
+        return flag == "1" and request.user.is_staff
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        requested = self.requested(request)
+        if not requested and random.random() >= SampleRate.get():
+            return self.get_response(request)
+        sampler = Sampler(threading.get_ident(), settings.PROFILER_INTERVAL)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        return self.finish(request, requested, stacks, started, response)
+
+    async def __acall__(self, request):
+        requested = await self.arequested(request)
+        if not requested and random.random() >= SampleRate.get():
+            return await self.get_response(request)
+        sampler = Sampler(interval=settings.PROFILER_INTERVAL)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        return self.finish(request, requested, stacks, started, response)
+
+    async def arequested(self, request):
+        """Асинхронная версия requested: пользователь загружается лениво."""
+        flag = request.headers.get("X-Profile") or request.GET.get("profile")
+        if flag != "1":
+            return False
+        user = await request.auser()
+        return user.is_staff
+
+    @staticmethod
+    def finish(request, requested, stacks, started, response):
+        """Сохраняет профиль и сообщает его имя сотруднику, запросившему его."""
+        try:
+            name = save_profile(request, stacks, time.perf_counter() - started)
+        except OSError:
+            logger.exception("Не удалось сохранить профиль в %s", settings.PROFILES_DIR)
+            return response
+        if requested:
+            response["X-Profile-File"] = name
+        return response
@@ -0,0 +1,239 @@
+import math
+import random
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import islice
+from multiprocessing import get_context
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.db.models import BigIntegerField, Max
+from django.db.models.functions import Cast, Substr
+from django.utils import timezone
+
+from post.models import Post, Subscription
+from post.services import SubscriptionService
+from users.models import User
+
+WORDS = (
+    "история заметка идея путешествие рецепт обзор город музыка книга фильм "
+    "искусство дизайн код проект вечер утро море горы свет цвет форма ритм "
+    "слово голос память время дорога сад дом мастер ученик работа отдых "
+    "photo story travel design music city light garden morning project"
+).split()
+
+# Состояния подписок: активна, ждет оплаты, истекла, брошена без оплаты
+SUBSCRIPTION_STATES = ("active", "pending", "expired", "abandoned")
+
+
+def _create_posts(seeder, user_ids, post_authors):
+    """Создание постов в дочернем процессе со своим подключением к БД."""
+    try:
+        return seeder.create_posts(user_ids, post_authors)
+    finally:
+        connections.close_all()
+
+
+class Seeder:
+    """
+    Генерация синтетических пользователей, постов и подписок.
+
+    Все строки пишутся пачками bulk_create, сигналы не вызываются: счетчики
+    постов и подписок пользователей считаются заранее и пишутся вместе
+    с пользователями. Пароль хешируется один раз на весь набор.
+    Посты можно вставлять в несколько процессов: основное время уходит
+    на расчет поискового вектора в PostgreSQL, и он параллелится по
+    подключениям.
+    """
+
+    PASSWORD = "seed-password"
+    # Параметры логнормального распределения числа слов в описании поста:
+    # медиана около 30 слов и длинный хвост до MAX_DESCRIPTION_WORDS
+    DESCRIPTION_MU = 3.4
+    DESCRIPTION_SIGMA = 0.8
+    MAX_DESCRIPTION_WORDS = 1000
+    FREE_SHARE = 0.3
+    PREVIEW_SHARE = 0.4
+    PREVIEW_FILES = 100
+
+    def __init__(
+        self,
+        batch_size=5000,
+        author_share=0.1,
+        seed=0,
+        prefix="seed",
+        password=PASSWORD,
+        workers=1,
+    ):
+        self.batch_size = batch_size
+        self.author_share = author_share
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self.password = password
+        self.workers = workers
+        # Слова пулом, чтобы не выбирать каждое слово длинного текста заново
+        self.word_pool = self.random.choices(WORDS, k=self.MAX_DESCRIPTION_WORDS * 4)
+
+    def text(self, words):
+        """Случайный текст из заданного числа слов."""
+        start = self.random.randrange(len(self.word_pool) - words)
+        return " ".join(self.word_pool[start : start + words]).capitalize()
+
+    def description_words(self):
+        """Число слов описания поста."""
+        words = self.random.lognormvariate(self.DESCRIPTION_MU, self.DESCRIPTION_SIGMA)
+        return max(1, min(self.MAX_DESCRIPTION_WORDS, int(words)))
+
+    def bulk_create(self, model, objects):
+        """Вставляет объекты пачками, каждую пачку отдельной транзакцией."""
+        objects = iter(objects)
+        created = []
+        while batch := list(islice(objects, self.batch_size)):
+            with transaction.atomic():
+                created.extend(model.objects.bulk_create(batch))
+        return created
+
+    def plan(self, users, posts, subscriptions):
+        """
+        Распределение постов по авторам и подписок по читателям.
+
+        Авторы - первые пользователи набора, возвращаются номера
+        пользователей внутри набора.
+        """
+        authors = max(1, math.ceil(users * self.author_share))
+        readers = max(1, users - authors)
+        post_authors = [self.random.randrange(authors) for _ in range(posts)]
+        if subscriptions <= readers:
+            subscribers = self.random.sample(range(readers), subscriptions)
+        else:
+            subscribers = self.random.choices(range(readers), k=subscriptions)
+        subscribers = [min(users - 1, authors + reader) for reader in subscribers]
+        return authors, post_authors, subscribers
+
+    def next_number(self):
+        """
+        Номер следующего пользователя набора: после наибольшего номера с тем же
+        префиксом, чтобы повторный запуск не повторял телефоны.
+        """
+        number = Cast(Substr("phone", len(self.prefix) + 1), BigIntegerField())
+        seeded = User.objects.filter(phone__regex=rf"^{re.escape(self.prefix)}[0-9]+$")
+        last = seeded.aggregate(last=Max(number))["last"]
+        return 0 if last is None else last + 1
+
+    def create_users(self, users, authors, post_counts, subscription_counts):
+        """Создает пользователей вместе со счетчиками и возвращает их id."""
+        start = self.next_number()
+        password = make_password(self.password)
+        return [
+            user.pk
+            for user in self.bulk_create(
+                User,
+                (
+                    User(
+                        phone=f"{self.prefix}{start + number:09}",
+                        email=f"{self.prefix}{start + number}@example.com",
+                        first_name=self.text(1),
+                        last_name=self.text(1),
+                        password=password,
+                        is_author=number < authors,
+                        post_count=post_counts[number],
+                        subscription_count=subscription_counts[number],
+                    )
+                    for number in range(users)
+                ),
+            )
+        ]
+
+    def create_posts(self, user_ids, post_authors):
+        """Создает посты, авторы заданы номерами пользователей набора."""
+        return len(
+            self.bulk_create(
+                Post,
+                (
+                    Post(
+                        author_id=user_ids[author],
+                        title=self.text(self.random.randint(2, 10)),
+                        description=self.text(self.description_words()),
+                        preview=(
+                            f"post/preview/{self.prefix}/"
+                            f"{self.random.randrange(self.PREVIEW_FILES)}.jpg"
+                            if self.random.random() < self.PREVIEW_SHARE
+                            else None
+                        ),
+                        is_free=self.random.random() < self.FREE_SHARE,
+                    )
+                    for author in post_authors
+                ),
+            )
+        )
+
+    def create_posts_parallel(self, user_ids, post_authors):
+        """Создает посты в нескольких процессах, деля их поровну."""
+        if self.workers <= 1:
+            return self.create_posts(user_ids, post_authors)
+        # Дочерние процессы открывают свои подключения, унаследованные закрываем
+        connections.close_all()
+        step = math.ceil(len(post_authors) / self.workers)
+        chunks = []
+        for number in range(self.workers):
+            seeder = Seeder(
+                self.batch_size,
+                self.author_share,
+                self.seed * self.workers + number,
+                self.prefix,
+            )
+            chunks.append((seeder, post_authors[number * step : (number + 1) * step]))
+        with ProcessPoolExecutor(self.workers, mp_context=get_context("fork")) as pool:
+            futures = [
+                pool.submit(_create_posts, seeder, user_ids, chunk)
+                for seeder, chunk in chunks
+            ]
+            return sum(future.result() for future in futures)
+
+    def subscription(self, user_id, now):
+        """Подписка случайного тарифа в случайном состоянии."""
+        type_of_sub, _ = self.random.choice(Subscription.SUB_CHOICES)
+        state = self.random.choice(SUBSCRIPTION_STATES)
+        duration = timedelta(
+            days=30 * SubscriptionService.get_subscription_interval(type_of_sub)
+        )
+        subscription = Subscription(
+            user_id=user_id,
+            type_of_sub=type_of_sub,
+            is_active=state in ("active", "pending"),
+            is_paid=state in ("active", "expired"),
+        )
+        if state == "active":
+            subscription.end_date = now + duration * self.random.random()
+        elif state == "expired":
+            subscription.end_date = now - duration * self.random.random()
+        elif state == "pending":
+            subscription.session_id = f"cs_{self.prefix}_{user_id}"
+            subscription.link = "https://checkout.stripe.com/c/pay/seed"
+            subscription.session_expires_at = now + timedelta(hours=12)
+        return subscription
+
+    def create_subscriptions(self, user_ids, subscribers):
+        """Создает подписки, подписчики заданы номерами пользователей набора."""
+        now = timezone.now()
+        return len(
+            self.bulk_create(
+                Subscription,
+                (self.subscription(user_ids[user], now) for user in subscribers),
+            )
+        )
+
+    def run(self, users, posts, subscriptions):
+        """Создает пользователей, посты и подписки, возвращает их количество."""
+        authors, post_authors, subscribers = self.plan(users, posts, subscriptions)
+        user_ids = self.create_users(
+            users, authors, Counter(post_authors), Counter(subscribers)
+        )
+        return {
+            "users": len(user_ids),
+            "posts": self.create_posts_parallel(user_ids, post_authors),
+            "subscriptions": self.create_subscriptions(user_ids, subscribers),
+        }
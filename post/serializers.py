@@ -0,0 +1,41 @@
+from rest_framework import serializers
+
+from post.models import Post
+from post.services import PostSearchService
+
+
+class PostSerializer(serializers.ModelSerializer):
+    """Сериализатор поста с выбором выводимых полей."""
+
+    class Meta:
+        model = Post
+        fields = (
+            "id",
+            "title",
+            "description",
+            "preview",
+            "is_free",
+            "author",
+            "updated_at",
+        )
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class PostSearchSerializer(serializers.ModelSerializer):
+    """Сериализатор результата поиска поста."""
+
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = ("id", "title", "is_free", "author", "rank", "headline")
+
+    def get_headline(self, obj):
+        """Фрагмент описания с выделенными тегом <mark> совпадениями."""
+        return PostSearchService.highlight(obj.headline)
@@ -1,34 +1,234 @@
+import calendar
+import csv
+import hashlib
+import io
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from itertools import islice
+
 import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank)
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.html import escape
+from django.utils.http import parse_http_date_safe
+
+from config.settings import (ENTITLEMENT_CACHE_TIMEOUT,
+                             POST_CARD_CACHE_TIMEOUT, RESPONSE_CACHE_TIMEOUT,
+                             STRIPE_API_KEY, STRIPE_WEBHOOK_SECRET)
+from post.models import (Post, SlowRequest, StripeEvent, StripePrice,
+                         Subscription)
+from post.thumbnails import thumbnail_source
+from users.models import User
 
-from config.settings import STRIPE_API_KEY
-from post.models import Subscription
+logger = logging.getLogger(__name__)
 
 stripe.api_key = STRIPE_API_KEY
 
 
+def _stripe_price_params(amount, interval):
+    """Параметры создания цены в stripe."""
+    return {
+        "currency": "usd",
+        "unit_amount": amount * 100,
+        "recurring": {"interval": "month", "interval_count": interval},
+        "product_data": {"name": "Subscription"},
+    }
+
+
+def _stripe_session_params(price_id):
+    """Параметры создания сессии на оплату в stripe."""
+    return {
+        "success_url": "http://127.0.0.1:8000/subscription/success/",  # Сделать шаблон спазипо за пподписку
+        # "cancel_url": "http://127.0.0.1:8000/",
+        "line_items": [{"price": price_id, "quantity": 1}],
+        "mode": "subscription",
+    }
+
+
+def _stripe_session_result(session):
+    """Идентификатор, ссылка и срок действия сессии на оплату."""
+    expires_at = session.get("expires_at")
+    if expires_at is not None:
+        expires_at = datetime.fromtimestamp(expires_at, tz=dt_timezone.utc)
+    return session.get("id"), session.get("url"), expires_at
+
+
+@asynccontextmanager
+async def stripe_async_client():
+    """
+    Клиент stripe с асинхронным HTTP-транспортом на aiohttp.
+
+    HTTP-сессия привязана к циклу событий, поэтому клиент создается на время
+    вызова и закрывается после него.
+    """
+    http_client = stripe.AIOHTTPClient()
+    try:
+        yield stripe.StripeClient(
+            stripe.api_key,
+            base_addresses={"api": stripe.api_base},
+            http_client=http_client,
+        )
+    finally:
+        await http_client.close_async()
+
+
 def get_stripe_price(amount, interval):
     """Создает цену в stripe."""
-    return stripe.Price.create(
-        currency="usd",
-        unit_amount=amount * 100,
-        recurring={"interval": "month", "interval_count": interval},
-        product_data={"name": "Subscription"},
-    )
+    return stripe.Price.create(**_stripe_price_params(amount, interval))
 
 
-def create_stripe_session(price):
+async def aget_stripe_price(amount, interval):
+    """Создает цену в stripe, не блокируя поток на время запроса."""
+    async with stripe_async_client() as client:
+        return await client.prices.create_async(
+            params=_stripe_price_params(amount, interval)
+        )
+
+
+def create_stripe_session(price_id):
     """Создает сессию на оплату в stripe."""
-    session = stripe.checkout.Session.create(
-        success_url="http://127.0.0.1:8000/subscription/success/",  # Сделать шаблон спазипо за пподписку
-        # cancel_url='http://127.0.0.1:8000/',
-        line_items=[{"price": price.get("id"), "quantity": 1}],
-        mode="subscription",
-    )
-    return session.get("id"), session.get("url")
+    session = stripe.checkout.Session.create(**_stripe_session_params(price_id))
+    return _stripe_session_result(session)
+
+
+async def acreate_stripe_session(price_id):
+    """Создает сессию на оплату в stripe, не блокируя поток на время запроса."""
+    async with stripe_async_client() as client:
+        session = await client.checkout.sessions.create_async(
+            params=_stripe_session_params(price_id)
+        )
+    return _stripe_session_result(session)
+
+
+def expire_stripe_session(session_id):
+    """Закрывает сессию на оплату в stripe, чтобы по ней нельзя было заплатить."""
+    if not session_id:
+        return
+    try:
+        stripe.checkout.Session.expire(session_id)
+    except stripe.InvalidRequestError as error:
+        # Сессия уже истекла или оплачена: оплату применит вебхук
+        logger.warning("Не удалось закрыть сессию %s: %s", session_id, error)
+
+
+async def aexpire_stripe_session(session_id):
+    """Закрывает сессию на оплату в stripe, не блокируя поток на время запроса."""
+    if not session_id:
+        return
+    try:
+        async with stripe_async_client() as client:
+            await client.checkout.sessions.expire_async(session_id)
+    except stripe.InvalidRequestError as error:
+        logger.warning("Не удалось закрыть сессию %s: %s", session_id, error)
+
+
+class PriceCatalog:
+    """Каталог цен Stripe: каждая цена создается в Stripe только один раз."""
+
+    # Кеш идентификаторов цен в памяти процесса
+    _price_ids = {}
+
+    @classmethod
+    def get_price_id(cls, type_of_sub, amount, interval):
+        """Возвращает идентификатор цены, создавая ее в Stripe только при отсутствии."""
+        key = (type_of_sub, amount, interval)
+        price_id = cls._price_ids.get(key)
+        if price_id is None:
+            price_id = (
+                StripePrice.objects.filter(
+                    type_of_sub=type_of_sub, amount=amount, interval=interval
+                )
+                .values_list("price_id", flat=True)
+                .first()
+            )
+        if price_id is None:
+            stripe_price = get_stripe_price(amount, interval)
+            price, _ = StripePrice.objects.get_or_create(
+                type_of_sub=type_of_sub,
+                amount=amount,
+                interval=interval,
+                defaults={"price_id": stripe_price.get("id")},
+            )
+            price_id = price.price_id
+        cls._price_ids[key] = price_id
+        return price_id
+
+    @classmethod
+    async def aget_price_id(cls, type_of_sub, amount, interval):
+        """Асинхронная версия get_price_id."""
+        key = (type_of_sub, amount, interval)
+        price_id = cls._price_ids.get(key)
+        if price_id is None:
+            price_id = (
+                await StripePrice.objects.filter(
+                    type_of_sub=type_of_sub, amount=amount, interval=interval
+                )
+                .values_list("price_id", flat=True)
+                .afirst()
+            )
+        if price_id is None:
+            stripe_price = await aget_stripe_price(amount, interval)
+            price, _ = await StripePrice.objects.aget_or_create(
+                type_of_sub=type_of_sub,
+                amount=amount,
+                interval=interval,
+                defaults={"price_id": stripe_price.get("id")},
+            )
+            price_id = price.price_id
+        cls._price_ids[key] = price_id
+        return price_id
+
+    @classmethod
+    def get_subscription_price_id(cls, subscription):
+        """Возвращает идентификатор цены для тарифа подписки."""
+        return cls.get_price_id(
+            subscription.type_of_sub,
+            subscription.get_price(),
+            SubscriptionService.get_subscription_interval(subscription.type_of_sub),
+        )
+
+    @classmethod
+    async def aget_subscription_price_id(cls, subscription):
+        """Асинхронная версия get_subscription_price_id."""
+        return await cls.aget_price_id(
+            subscription.type_of_sub,
+            subscription.get_price(),
+            SubscriptionService.get_subscription_interval(subscription.type_of_sub),
+        )
+
+    @classmethod
+    def warm(cls):
+        """Заполняет каталог ценами всех тарифов и возвращает их количество."""
+        for type_of_sub, _ in Subscription.SUB_CHOICES:
+            cls.get_subscription_price_id(Subscription(type_of_sub=type_of_sub))
+        return len(Subscription.SUB_CHOICES)
+
+    @classmethod
+    def clear(cls):
+        """Очищает кеш цен в памяти процесса."""
+        cls._price_ids.clear()
 
 
 class SubscriptionService:
 
+    # Сессию не переиспользуем, если до ее истечения осталось меньше этого времени
+    SESSION_REUSE_MARGIN = timedelta(minutes=5)
+
     @staticmethod
     def get_subscription_interval(type_of_sub):
         """Определяет продолжительность выбранной подписки."""
@@ -41,12 +241,67 @@ class SubscriptionService:
         if type_of_sub == "one_year":
             return 12
 
+    @staticmethod
+    def get_end_date(start_date, type_of_sub):
+        """Определяет дату окончания подписки по дате старта и длительности тарифа."""
+        months = start_date.month - 1
+        months += SubscriptionService.get_subscription_interval(type_of_sub)
+        year, month = start_date.year + months // 12, months % 12 + 1
+        day = min(start_date.day, calendar.monthrange(year, month)[1])
+        return start_date.replace(year=year, month=month, day=day)
+
+    @staticmethod
+    def fill_end_dates(chunk_size=1000):
+        """Проставляет дату окончания оплаченным подпискам без нее, возвращает их число."""
+        total, last_id = 0, 0
+        while True:
+            chunk = list(
+                Subscription.objects.filter(
+                    id__gt=last_id,
+                    is_paid=True,
+                    end_date__isnull=True,
+                    start_date__isnull=False,
+                )
+                .order_by("id")
+                .only("id", "type_of_sub", "start_date")[:chunk_size]
+            )
+            if not chunk:
+                return total
+            for subscription in chunk:
+                subscription.end_date = SubscriptionService.get_end_date(
+                    subscription.start_date, subscription.type_of_sub
+                )
+            Subscription.objects.bulk_update(chunk, ["end_date"])
+            total += len(chunk)
+            last_id = chunk[-1].id
+
+    @staticmethod
+    def deactivate_expired(chunk_size=1000, now=None):
+        """Деактивирует истекшие подписки порциями, возвращает их число."""
+        now = now or timezone.now()
+        total = 0
+        while True:
+            chunk = list(
+                Subscription.objects.filter(is_active=True, end_date__lte=now)
+                .order_by("end_date")
+                .values_list("id", "user_id")[:chunk_size]
+            )
+            if not chunk:
+                return total
+            ids, user_ids = zip(*chunk)
+            total += Subscription.objects.filter(id__in=ids).update(is_active=False)
+            # update() не отправляет сигналы, поэтому кеш статуса сбрасываем сами
+            EntitlementService.invalidate(*set(user_ids))
+
     @staticmethod
     def has_active_subscription(user):
         """Проверяет, есть ли у пользователя активная подписка."""
-        return Subscription.objects.filter(
-            user=user, is_active=True, is_paid=True
-        ).exists()
+        return EntitlementService.get_status(user)["is_paid"]
+
+    @staticmethod
+    async def ahas_active_subscription(user):
+        """Асинхронная версия has_active_subscription."""
+        return (await EntitlementService.aget_status(user))["is_paid"]
 
     @staticmethod
     def create_or_update_subscription(user, type_of_sub):
@@ -56,8 +311,853 @@ class SubscriptionService:
         )
 
         # Если подписка уже существует, обновляем тип подписки
-        if not created:
-            subscription.type_of_sub = type_of_sub
+        if not created and subscription.type_of_sub != type_of_sub:
+            expire_stripe_session(subscription.session_id)
+            SubscriptionService._change_type(subscription, type_of_sub)
             subscription.save()
 
         return subscription
+
+    @staticmethod
+    async def acreate_or_update_subscription(user, type_of_sub):
+        """Асинхронная версия create_or_update_subscription."""
+        subscription, created = await Subscription.objects.aget_or_create(
+            user=user, is_paid=False, defaults={"type_of_sub": type_of_sub}
+        )
+
+        if not created and subscription.type_of_sub != type_of_sub:
+            await aexpire_stripe_session(subscription.session_id)
+            SubscriptionService._change_type(subscription, type_of_sub)
+            await subscription.asave()
+
+        return subscription
+
+    @staticmethod
+    def _change_type(subscription, type_of_sub):
+        """
+        Меняет тариф подписки и забывает сессию прежнего тарифа.
+
+        Саму сессию в Stripe перед этим закрывает expire_stripe_session, иначе
+        по старой ссылке можно оплатить прежний тариф.
+        """
+        subscription.type_of_sub = type_of_sub
+        subscription.session_id = None
+        subscription.link = None
+        subscription.session_expires_at = None
+
+    @staticmethod
+    def has_open_session(subscription):
+        """Проверяет, можно ли переиспользовать открытую сессию оплаты подписки."""
+        if not subscription.session_id or not subscription.link:
+            return False
+        if subscription.session_expires_at is None:
+            return False
+        return (
+            subscription.session_expires_at
+            > timezone.now() + SubscriptionService.SESSION_REUSE_MARGIN
+        )
+
+
+class EntitlementService:
+    """Статус подписки пользователя, закешированный на ENTITLEMENT_CACHE_TIMEOUT секунд."""
+
+    @staticmethod
+    def cache_key(user_id):
+        """Ключ кеша статуса подписки пользователя."""
+        return f"entitlement:{user_id}"
+
+    @staticmethod
+    def get_status(user):
+        """Возвращает статус подписки пользователя, обращаясь к БД только при промахе кеша."""
+        key = EntitlementService.cache_key(user.pk)
+        status = cache.get(key)
+        if status is None:
+            status = EntitlementService.compute_status(user.pk)
+            cache.set(key, status, ENTITLEMENT_CACHE_TIMEOUT)
+        return status
+
+    @staticmethod
+    async def aget_status(user):
+        """Асинхронная версия get_status."""
+        key = EntitlementService.cache_key(user.pk)
+        status = await cache.aget(key)
+        if status is None:
+            status = await sync_to_async(EntitlementService.compute_status)(user.pk)
+            await cache.aset(key, status, ENTITLEMENT_CACHE_TIMEOUT)
+        return status
+
+    @staticmethod
+    def compute_status(user_id):
+        """Вычисляет статус по активным подпискам пользователя одним запросом."""
+        subscription = (
+            Subscription.objects.filter(user_id=user_id, is_active=True)
+            .order_by("-is_paid", "-id")
+            .values("id", "type_of_sub", "is_paid", "end_date")
+            .first()
+        )
+        if subscription is None:
+            return {"id": None, "type_of_sub": None, "is_paid": False, "end_date": None}
+        return subscription
+
+    @staticmethod
+    def invalidate(*user_ids):
+        """Сбрасывает закешированный статус подписки пользователей."""
+        cache.delete_many(
+            [EntitlementService.cache_key(user_id) for user_id in user_ids if user_id]
+        )
+
+
+class StripeEventService:
+    """Прием событий вебхука Stripe и их пакетное применение к подпискам."""
+
+    PAID_EVENTS = (
+        "checkout.session.completed",
+        "checkout.session.async_payment_succeeded",
+    )
+    EXPIRED_EVENTS = ("checkout.session.expired",)
+    PAID_STATUSES = ("paid", "no_payment_required")
+
+    @staticmethod
+    def parse_event(payload, signature):
+        """Проверяет подпись вебхука и возвращает данные события."""
+        if not STRIPE_WEBHOOK_SECRET:
+            raise stripe.SignatureVerificationError(
+                "Не задан STRIPE_WEBHOOK_SECRET.", signature, payload
+            )
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"),
+            signature,
+            STRIPE_WEBHOOK_SECRET,
+            stripe.Webhook.DEFAULT_TOLERANCE,
+        )
+        return json.loads(payload)
+
+    @staticmethod
+    def record(event):
+        """Сохраняет событие во входящую очередь, повторы по id отбрасываются."""
+        StripeEvent.objects.bulk_create(
+            [StripeEvent(event_id=event["id"], type=event["type"], payload=event)],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def process_batch(batch_size=500):
+        """Применяет пачку необработанных событий к подпискам, возвращает их число."""
+        with transaction.atomic():
+            events = list(
+                StripeEvent.objects.filter(processed_at__isnull=True)
+                .select_for_update(skip_locked=True)
+                .order_by("received_at")[:batch_size]
+            )
+            if not events:
+                return 0
+
+            # Итог по каждой сессии оплаты: оплата важнее истечения
+            sessions, paid_events = {}, []
+            for event in events:
+                session = event.payload.get("data", {}).get("object", {})
+                session_id = session.get("id")
+                if (
+                    event.type in StripeEventService.PAID_EVENTS
+                    and session.get("payment_status")
+                    in StripeEventService.PAID_STATUSES
+                ):
+                    sessions[session_id] = ("paid", event.payload["created"])
+                    paid_events.append((event, session_id))
+                elif event.type in StripeEventService.EXPIRED_EVENTS:
+                    sessions.setdefault(session_id, ("expired", None))
+
+            paid, expired, matched = [], [], set()
+            for subscription in Subscription.objects.filter(session_id__in=sessions):
+                matched.add(subscription.session_id)
+                status, created = sessions[subscription.session_id]
+                if subscription.is_paid:
+                    continue
+                if status == "paid":
+                    subscription.is_paid = True
+                    subscription.start_date = datetime.fromtimestamp(
+                        created, tz=dt_timezone.utc
+                    )
+                    subscription.end_date = SubscriptionService.get_end_date(
+                        subscription.start_date, subscription.type_of_sub
+                    )
+                    paid.append(subscription)
+                else:
+                    subscription.session_id = None
+                    subscription.link = None
+                    subscription.session_expires_at = None
+                    expired.append(subscription)
+
+            Subscription.objects.bulk_update(
+                paid, ["is_paid", "start_date", "end_date"], batch_size=batch_size
+            )
+            Subscription.objects.bulk_update(
+                expired,
+                ["session_id", "link", "session_expires_at"],
+                batch_size=batch_size,
+            )
+            # Оплата без подписки: деньги получены, но доступ не выдан
+            unmatched = []
+            for event, session_id in paid_events:
+                if session_id not in matched:
+                    logger.error(
+                        "Оплата без подписки: событие %s, сессия %s",
+                        event.event_id,
+                        session_id,
+                    )
+                    unmatched.append(event.pk)
+            StripeEvent.objects.filter(pk__in=unmatched).update(is_unmatched=True)
+            StripeEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                processed_at=timezone.now()
+            )
+
+        # bulk_update не отправляет сигналы, поэтому кеш статуса сбрасываем сами
+        EntitlementService.invalidate(*{subscription.user_id for subscription in paid})
+        return len(events)
+
+
+class PostAccessService:
+    """Доступ к постам: платные видны только автору и подписчикам."""
+
+    @staticmethod
+    def visible_posts(user):
+        """Посты, доступные пользователю."""
+        if not user.is_authenticated:
+            return Post.objects.filter(is_free=True)
+        if EntitlementService.get_status(user)["is_paid"]:
+            return Post.objects.all()
+        return Post.objects.filter(Q(is_free=True) | Q(author_id=user.pk))
+
+
+class MediaAccessService:
+    """Проверка доступа к медиафайлам: превью платных постов только для имеющих доступ."""
+
+    # Файл доступен всем и может кешироваться прокси
+    PUBLIC = "public"
+    # Файл доступен конкретному пользователю
+    PRIVATE = "private"
+
+    @staticmethod
+    def is_protected(name):
+        """Относится ли файл к превью постов."""
+        return name.startswith(f"{Post._meta.get_field('preview').upload_to}/")
+
+    @staticmethod
+    def get_access(user, name):
+        """
+        Определяет доступ к файлу: бесплатный пост, автор поста или оплаченная подписка.
+
+        Превью проверяется по доступу к единственному оригиналу. Один файл
+        может стоять у нескольких постов (синтетические данные, импорт):
+        тогда он доступен, если доступен хотя бы один из них.
+
+        Возвращает PUBLIC, PRIVATE или None, если доступа нет.
+        """
+        if not MediaAccessService.is_protected(name):
+            return MediaAccessService.PUBLIC
+
+        source = thumbnail_source(name) or name
+        posts = list(
+            Post.objects.filter(preview=source).values_list("is_free", "author_id")
+        )
+
+        if any(is_free for is_free, _ in posts):
+            return MediaAccessService.PUBLIC
+        if not posts or not user.is_authenticated:
+            return None
+        if any(author_id == user.pk for _, author_id in posts):
+            return MediaAccessService.PRIVATE
+        if EntitlementService.get_status(user)["is_paid"]:
+            return MediaAccessService.PRIVATE
+        return None
+
+
+class PostCardCache:
+    """Кеш отрисованных карточек постов с учетом уровня доступа зрителя."""
+
+    ANONYMOUS = "anonymous"
+    SUBSCRIBER = "subscriber"
+    AUTHOR = "author"
+    TIERS = (ANONYMOUS, SUBSCRIBER, AUTHOR)
+
+    TEMPLATE_NAME = "post/includes/post_card.html"
+
+    @staticmethod
+    def get_tier(user, post, is_paid):
+        """Уровень доступа зрителя к посту: от него зависит вид карточки."""
+        if user.is_authenticated and user.pk == post.author_id:
+            return PostCardCache.AUTHOR
+        if is_paid:
+            return PostCardCache.SUBSCRIBER
+        return PostCardCache.ANONYMOUS
+
+    @staticmethod
+    def cache_key(post_id, updated_at, tier):
+        """Ключ кеша карточки: пост, его версия и уровень доступа."""
+        return f"post_card:{post_id}:{updated_at.timestamp()}:{tier}"
+
+    @staticmethod
+    def render_many(posts, user):
+        """Возвращает HTML карточек по id постов, отрисовывая только промахи кеша."""
+        is_paid = (
+            user.is_authenticated and EntitlementService.get_status(user)["is_paid"]
+        )
+        tiers, keys = {}, {}
+        for post in posts:
+            tiers[post.pk] = PostCardCache.get_tier(user, post, is_paid)
+            keys[post.pk] = PostCardCache.cache_key(
+                post.pk, post.updated_at, tiers[post.pk]
+            )
+
+        cached = cache.get_many(list(keys.values()))
+        cards, missing = {}, {}
+        for post in posts:
+            html = cached.get(keys[post.pk])
+            if html is None:
+                html = render_to_string(
+                    PostCardCache.TEMPLATE_NAME,
+                    {"object": post, "tier": tiers[post.pk]},
+                )
+                missing[keys[post.pk]] = html
+            cards[post.pk] = html
+        if missing:
+            cache.set_many(missing, POST_CARD_CACHE_TIMEOUT)
+        return cards
+
+    @staticmethod
+    def invalidate(post_id, updated_at):
+        """Удаляет закешированные карточки версии поста для всех уровней доступа."""
+        cache.delete_many(
+            [
+                PostCardCache.cache_key(post_id, updated_at, tier)
+                for tier in PostCardCache.TIERS
+            ]
+        )
+
+
+class ResponseCache:
+    """
+    Кеш готовых ответов для анонимных посетителей с инвалидацией по тегам.
+
+    Каждый ответ запоминает версии своих тегов. Версия - номер сброса из
+    общей последовательности: сброс тега записывает ему следующий номер,
+    и все ответы, сохраненные со старой версией, становятся промахами.
+    Номер последовательности снимается до выборки данных страницы: если
+    тег сбросили позже, страница могла устареть и не сохраняется.
+    """
+
+    # Тег набора постов: меняется при добавлении, удалении и смене порядка
+    POSTS_TAG = "posts"
+    # Заголовки, которые сохраняются вместе с содержимым ответа
+    STORED_HEADERS = ("ETag", "Last-Modified", "Cache-Control")
+    HITS_KEY = "response_cache:hits"
+    MISSES_KEY = "response_cache:misses"
+    SEQUENCE_KEY = "response_cache:sequence"
+
+    @staticmethod
+    def cache_key(request):
+        """Ключ кеша ответа по пути и параметрам запроса."""
+        digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f"response_cache:page:{digest}"
+
+    @staticmethod
+    def tag_key(tag):
+        """Ключ кеша текущей версии тега."""
+        return f"response_cache:version:{tag}"
+
+    @staticmethod
+    def sequence():
+        """
+        Номер последнего сброса тегов: снимок перед выборкой данных страницы.
+
+        Если счетчик вытеснен из кеша, он начинается с текущего времени в мс,
+        чтобы не оказаться меньше уже выданных версий.
+        """
+        sequence = cache.get(ResponseCache.SEQUENCE_KEY)
+        if sequence is None:
+            cache.add(ResponseCache.SEQUENCE_KEY, int(time.time() * 1000), None)
+            sequence = cache.get(ResponseCache.SEQUENCE_KEY)
+        return sequence
+
+    @staticmethod
+    def post_tags(posts):
+        """Теги страницы со списком постов: сами посты и их авторы."""
+        tags = {ResponseCache.POSTS_TAG}
+        for post in posts:
+            tags.add(f"post:{post.pk}")
+            tags.add(f"author:{post.author_id}")
+        return tags
+
+    @staticmethod
+    def get(request):
+        """Возвращает сохраненный ответ, если ни один из его тегов не сброшен."""
+        entry = cache.get(ResponseCache.cache_key(request))
+        if entry is not None:
+            versions = cache.get_many(
+                [ResponseCache.tag_key(tag) for tag in entry["tags"]]
+            )
+            if all(
+                versions.get(ResponseCache.tag_key(tag)) == version
+                for tag, version in entry["tags"].items()
+            ):
+                ResponseCache._count(ResponseCache.HITS_KEY)
+                response = HttpResponse(
+                    entry["content"], content_type=entry["content_type"]
+                )
+                for header, value in entry["headers"].items():
+                    response[header] = value
+                response["X-Cache"] = "HIT"
+                # Сохраненные валидаторы позволяют ответить 304 без запросов к БД
+                return get_conditional_response(
+                    request,
+                    etag=response.get("ETag"),
+                    last_modified=parse_http_date_safe(
+                        response.get("Last-Modified", "")
+                    ),
+                    response=response,
+                )
+        ResponseCache._count(ResponseCache.MISSES_KEY)
+        return None
+
+    @staticmethod
+    def set(request, response, tags, sequence):
+        """
+        Сохраняет ответ вместе с версиями его тегов.
+
+        sequence - номер из sequence(), снятый до выборки данных страницы.
+        Если какой-то тег сброшен после него, ответ не сохраняется. Тегу без
+        версии (его еще не сбрасывали) записывается версия sequence.
+        """
+        response["X-Cache"] = "MISS"
+        # Страница с CSRF-токеном принадлежит конкретному посетителю
+        if response.status_code != 200 or request.META.get("CSRF_COOKIE_NEEDS_UPDATE"):
+            return
+        keys = {ResponseCache.tag_key(tag): tag for tag in tags}
+        versions = cache.get_many(list(keys))
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            for key in missing:
+                cache.add(key, sequence, None)
+            versions.update(cache.get_many(missing))
+        if any(versions.get(key, sequence + 1) > sequence for key in keys):
+            return
+        cache.set(
+            ResponseCache.cache_key(request),
+            {
+                "tags": {tag: versions[key] for key, tag in keys.items()},
+                "content": response.content,
+                "content_type": response["Content-Type"],
+                "headers": {
+                    header: response[header]
+                    for header in ResponseCache.STORED_HEADERS
+                    if header in response
+                },
+            },
+            RESPONSE_CACHE_TIMEOUT,
+        )
+
+    @staticmethod
+    def tag_version(tag):
+        """Текущая версия тега, меняется при каждом его сбросе."""
+        key = ResponseCache.tag_key(tag)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, ResponseCache.sequence(), None)
+            version = cache.get(key)
+        return version
+
+    @staticmethod
+    def invalidate(*tags):
+        """Сбрасывает теги, а вместе с ними и все помеченные ими ответы."""
+        ResponseCache.sequence()
+        try:
+            sequence = cache.incr(ResponseCache.SEQUENCE_KEY)
+        except ValueError:
+            # Счетчик вытеснен между чтением и увеличением
+            ResponseCache.sequence()
+            sequence = cache.incr(ResponseCache.SEQUENCE_KEY)
+        cache.set_many({ResponseCache.tag_key(tag): sequence for tag in tags}, None)
+
+    @staticmethod
+    def _count(key):
+        """Увеличивает счетчик попаданий или промахов."""
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+    @staticmethod
+    def stats():
+        """Счетчики попаданий и промахов кеша ответов."""
+        counters = cache.get_many([ResponseCache.HITS_KEY, ResponseCache.MISSES_KEY])
+        hits = counters.get(ResponseCache.HITS_KEY, 0)
+        misses = counters.get(ResponseCache.MISSES_KEY, 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+    @staticmethod
+    def reset_stats():
+        """Обнуляет счетчики попаданий и промахов."""
+        cache.delete_many([ResponseCache.HITS_KEY, ResponseCache.MISSES_KEY])
+
+
+class PostSearchService:
+    """Полнотекстовый поиск постов по заголовку и описанию."""
+
+    # Границы совпадений во фрагменте: заменяются на <mark> после экранирования
+    HIGHLIGHT_START = "\x02"
+    HIGHLIGHT_STOP = "\x03"
+
+    @staticmethod
+    def build_query(text):
+        """Запрос в синтаксисе веб-поиска сразу по русской и английской морфологии."""
+        return SearchQuery(text, config="russian", search_type="websearch") | (
+            SearchQuery(text, config="english", search_type="websearch")
+        )
+
+    @staticmethod
+    def search(text, user):
+        """Доступные пользователю посты по запросу, от самых релевантных."""
+        query = PostSearchService.build_query(text)
+        # Фрагмент считается только для строк страницы: PostgreSQL откладывает
+        # вычисление списка полей до LIMIT
+        return (
+            PostAccessService.visible_posts(user)
+            .filter(search_vector=query)
+            .annotate(
+                rank=SearchRank(F("search_vector"), query),
+                headline=SearchHeadline(
+                    "description",
+                    query,
+                    config="russian",
+                    start_sel=PostSearchService.HIGHLIGHT_START,
+                    stop_sel=PostSearchService.HIGHLIGHT_STOP,
+                    max_fragments=2,
+                ),
+            )
+            .only("id", "title", "is_free", "author_id")
+            .order_by("-rank", "-id")
+        )
+
+    @staticmethod
+    def highlight(headline):
+        """HTML фрагмента: текст экранируется, совпадения выделяются тегом <mark>."""
+        return (
+            escape(headline or "")
+            .replace(PostSearchService.HIGHLIGHT_START, "<mark>")
+            .replace(PostSearchService.HIGHLIGHT_STOP, "</mark>")
+        )
+
+
+class SubscriptionExportService:
+    """Потоковая выгрузка подписок в CSV или JSON Lines для бухгалтерии."""
+
+    FIELDS = (
+        "id",
+        "user_id",
+        "phone",
+        "email",
+        "type_of_sub",
+        "price",
+        "start_date",
+        "end_date",
+        "is_paid",
+        "is_active",
+    )
+    CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+    # Строк на одно чтение серверного курсора и на один отправляемый кусок
+    CHUNK_SIZE = 2000
+    FLUSH_SIZE = 500
+
+    @staticmethod
+    def get_queryset(start=None, end=None):
+        """Подписки с датой старта в диапазоне [start, end], по возрастанию id."""
+        queryset = Subscription.objects.order_by("id").values_list(
+            "id",
+            "user_id",
+            "user__phone",
+            "user__email",
+            "type_of_sub",
+            "start_date",
+            "end_date",
+            "is_paid",
+            "is_active",
+        )
+        if start:
+            queryset = queryset.filter(
+                start_date__gte=timezone.make_aware(
+                    datetime.combine(start, datetime.min.time())
+                )
+            )
+        if end:
+            queryset = queryset.filter(
+                start_date__lt=timezone.make_aware(
+                    datetime.combine(end + timedelta(days=1), datetime.min.time())
+                )
+            )
+        return queryset
+
+    @staticmethod
+    def make_encoder(file_format):
+        """Функция, превращающая строку выборки в строку файла."""
+        prices = {
+            type_of_sub: Subscription(type_of_sub=type_of_sub).get_price()
+            for type_of_sub, _ in Subscription.SUB_CHOICES
+        }
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def encode(row):
+            pk, user_id, phone, email, type_of_sub, start, end, is_paid, is_active = row
+            values = (
+                pk,
+                user_id,
+                phone,
+                email,
+                type_of_sub,
+                prices.get(type_of_sub, 0),
+                start.isoformat() if start else None,
+                end.isoformat() if end else None,
+                is_paid,
+                is_active,
+            )
+            if file_format == "jsonl":
+                return (
+                    json.dumps(
+                        dict(zip(SubscriptionExportService.FIELDS, values)),
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                )
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(values)
+            return buffer.getvalue()
+
+        return encode
+
+    @staticmethod
+    def header(file_format):
+        """Заголовок файла: отправляется сразу, еще до выполнения запроса."""
+        if file_format != "csv":
+            return ""
+        return ",".join(SubscriptionExportService.FIELDS) + "\r\n"
+
+    @staticmethod
+    def stream(file_format, start=None, end=None):
+        """Отдает файл кусками, читая подписки серверным курсором."""
+        yield SubscriptionExportService.header(file_format)
+        encode = SubscriptionExportService.make_encoder(file_format)
+        queryset = SubscriptionExportService.get_queryset(start, end)
+        lines = []
+        for row in queryset.iterator(chunk_size=SubscriptionExportService.CHUNK_SIZE):
+            lines.append(encode(row))
+            if len(lines) >= SubscriptionExportService.FLUSH_SIZE:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+
+    @staticmethod
+    async def astream(file_format, start=None, end=None):
+        """Асинхронная версия stream для ASGI-сервера."""
+        yield SubscriptionExportService.header(file_format)
+        encode = SubscriptionExportService.make_encoder(file_format)
+        queryset = SubscriptionExportService.get_queryset(start, end)
+        # aiterator() у values_list выполняет запрос прямо в event loop,
+        # поэтому порции серверного курсора читаются в потоке
+        rows = queryset.iterator(chunk_size=SubscriptionExportService.CHUNK_SIZE)
+        read_chunk = sync_to_async(
+            lambda: list(islice(rows, SubscriptionExportService.FLUSH_SIZE))
+        )
+        while chunk := await read_chunk():
+            yield "".join(encode(row) for row in chunk)
+
+
+class CounterService:
+    """
+    Денормализованные счетчики постов, подписок и просмотров.
+
+    Счетчики меняются одним UPDATE с F-выражением, без чтения строки,
+    поэтому параллельные изменения не теряются. Расхождения, например после
+    загрузки фикстур, исправляет команда recount.
+    """
+
+    # Счетчик пользователя и связанная модель, по которой он пересчитывается
+    USER_COUNTERS = {
+        "post_count": (Post, "author"),
+        "subscription_count": (Subscription, "user"),
+    }
+
+    @staticmethod
+    def change(user_id, field, delta):
+        """Изменяет счетчик пользователя на delta, не опуская его ниже нуля."""
+        if user_id is None or not delta:
+            return
+        User.objects.filter(pk=user_id).update(
+            **{field: Greatest(F(field) + delta, Value(0))}
+        )
+
+    @staticmethod
+    def add_posts(counts):
+        """Увеличивает счетчики постов авторов по словарю {id автора: число}."""
+        for author_id, count in counts.items():
+            CounterService.change(author_id, "post_count", count)
+
+    @staticmethod
+    def record_view(post_id):
+        """Учитывает просмотр поста, не меняя дату его изменения."""
+        Post.objects.filter(pk=post_id).update(view_count=F("view_count") + 1)
+
+    @staticmethod
+    def recount(field, batch_size=1000):
+        """
+        Пересчитывает счетчик пользователей пачками по диапазонам id.
+
+        Обновляются только разошедшиеся строки, возвращается их число.
+        """
+        model, related_field = CounterService.USER_COUNTERS[field]
+        actual = Coalesce(
+            Subquery(
+                model.objects.filter(**{related_field: OuterRef("pk")})
+                .order_by()
+                .values(related_field)
+                .annotate(count=Count("*"))
+                .values("count")
+            ),
+            0,
+        )
+        fixed = 0
+        last_id = User.objects.order_by("-pk").values_list("pk", flat=True).first()
+        for start in range(0, (last_id or 0) + 1, batch_size):
+            with transaction.atomic():
+                fixed += (
+                    User.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+                    .annotate(actual=actual)
+                    .exclude(**{field: F("actual")})
+                    .update(**{field: actual})
+                )
+        return fixed
+
+
+class SlowRequestService:
+    """
+    Сохранение медленных запросов с их SQL в таблицу SlowRequest.
+
+    Запросы группируются по шаблону: значения параметров, литералы и длина
+    списков IN отбрасываются, поэтому N+1 виден как один шаблон с большим
+    count. Для самых долгих шаблонов SELECT сохраняется план EXPLAIN без
+    ANALYZE: запрос при этом не выполняется. Значения параметров не
+    сохраняются.
+    """
+
+    SPACES_RE = re.compile(r"\s+")
+    IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+    LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+    @staticmethod
+    def is_slow(stats, duration):
+        """Нужно ли сохранить запрос: он или один из его SQL дольше порога."""
+        if stats.statements is None:
+            return False
+        request_threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if request_threshold and duration * 1000 >= request_threshold:
+            return True
+        query_threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        return bool(query_threshold) and any(
+            elapsed * 1000 >= query_threshold for _, _, elapsed, _ in stats.statements
+        )
+
+    @staticmethod
+    def normalize(sql):
+        """Шаблон SQL-запроса без значений."""
+        sql = SlowRequestService.SPACES_RE.sub(" ", sql).strip()
+        sql = SlowRequestService.IN_LIST_RE.sub("IN (...)", sql)
+        return SlowRequestService.LITERAL_RE.sub("?", sql)
+
+    @staticmethod
+    def group(statements):
+        """
+        Группы SQL-запросов по шаблону, от самых долгих по сумме.
+
+        Возвращает пары (группа, пример запроса для EXPLAIN).
+        """
+        groups = {}
+        examples = {}
+        for sql, params, elapsed, alias in statements:
+            key = SlowRequestService.normalize(sql)
+            elapsed_ms = elapsed * 1000
+            group = groups.setdefault(
+                key, {"sql": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            group["count"] += 1
+            group["total_ms"] += elapsed_ms
+            if elapsed_ms >= group["max_ms"]:
+                group["max_ms"] = elapsed_ms
+                examples[key] = (sql, params, alias)
+        return sorted(
+            ((group, examples[key]) for key, group in groups.items()),
+            key=lambda item: -item[0]["total_ms"],
+        )
+
+    @staticmethod
+    def explain(sql, params, alias):
+        """План запроса SELECT без его выполнения или None."""
+        if params is None or not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+                return "\n".join(str(row[-1]) for row in cursor.fetchall())
+        except DatabaseError:
+            return None
+
+    @staticmethod
+    def reserve(view):
+        """
+        Занимает право сохранить медленный запрос контроллера.
+
+        Через общий кеш: не чаще раза в SLOW_REQUEST_CAPTURE_INTERVAL
+        секунд на контроллер во всех процессах.
+        """
+        interval = settings.SLOW_REQUEST_CAPTURE_INTERVAL
+        return not interval or cache.add(f"slow_request:{view}", 1, interval)
+
+    @staticmethod
+    def capture(view, request, response, stats, duration):
+        """
+        Сохраняет медленный запрос и удаляет вышедшие за SLOW_REQUEST_KEEP.
+
+        Возвращает None, если запрос этого контроллера уже недавно сохранялся.
+        """
+        if not SlowRequestService.reserve(view):
+            return None
+        statements = []
+        for number, (group, example) in enumerate(
+            SlowRequestService.group(stats.statements)
+        ):
+            if number < settings.SLOW_REQUEST_EXPLAIN:
+                group["plan"] = SlowRequestService.explain(*example)
+            group["total_ms"] = round(group["total_ms"], 3)
+            group["max_ms"] = round(group["max_ms"], 3)
+            statements.append(group)
+        slow_request = SlowRequest.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:500],
+            view_name=view[:200],
+            status_code=response.status_code,
+            duration_ms=round(duration * 1000, 3),
+            query_count=stats.queries,
+            query_ms=round(stats.query_seconds * 1000, 3),
+            statements=statements,
+        )
+        SlowRequest.objects.filter(
+            pk__lte=slow_request.pk - settings.SLOW_REQUEST_KEEP
+        ).delete()
+        return slow_request
@@ -0,0 +1,130 @@
+import logging
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from post.metrics import install_query_timer
+from post.models import Post, Subscription
+from post.services import (CounterService, EntitlementService, PostCardCache,
+                           ResponseCache)
+from post.thumbnails import ensure_thumbnails
+from users.services import AuthorHeaderCache
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Включает учет SQL-запросов в метриках контроллеров."""
+    install_query_timer(connection)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def reset_entitlement(sender, instance, **kwargs):
+    """Сбрасывает кеш статуса подписки при изменении подписки пользователя."""
+    EntitlementService.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def make_preview_thumbnails(sender, instance, raw, update_fields, **kwargs):
+    """Создает уменьшенные копии превью поста при загрузке."""
+    if raw or (update_fields is not None and "preview" not in update_fields):
+        return
+    try:
+        ensure_thumbnails(instance.preview)
+    except OSError:
+        logger.exception("Не удалось создать превью для %s", instance.preview.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def reset_post_card(sender, instance, signal, **kwargs):
+    """
+    Сбрасывает закешированные карточки поста и шапку его автора.
+
+    Ключ карточки содержит updated_at, поэтому после сохранения удаляются
+    карточки прежней версии, прочитанной в remember_post_order.
+    """
+    if signal is post_save:
+        updated_at = getattr(instance, "_previous_updated_at", None)
+    else:
+        updated_at = instance.updated_at
+    if updated_at is not None:
+        PostCardCache.invalidate(instance.pk, updated_at)
+    AuthorHeaderCache.invalidate(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_order(sender, instance, raw, **kwargs):
+    """
+    Запоминает, меняет ли сохранение положение поста в списках, его прежнего
+    автора и прежнюю версию для сброса карточек.
+    """
+    instance._previous_author_id = None
+    instance._previous_updated_at = None
+    if raw or instance.pk is None:
+        instance._moves_in_lists = True
+        return
+    previous = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list("is_free", "title", "author_id", "updated_at")
+        .first()
+    )
+    if previous is None:
+        instance._moves_in_lists = True
+        return
+    instance._moves_in_lists = previous[:2] != (instance.is_free, instance.title)
+    instance._previous_author_id = previous[2]
+    instance._previous_updated_at = previous[3]
+
+
+@receiver(post_save, sender=Post)
+def count_author_posts(sender, instance, created, raw, **kwargs):
+    """Обновляет счетчик постов автора при создании поста или смене автора."""
+    if raw:
+        return
+    if created:
+        CounterService.change(instance.author_id, "post_count", 1)
+        return
+    previous_author_id = getattr(instance, "_previous_author_id", None)
+    if previous_author_id not in (None, instance.author_id):
+        CounterService.change(previous_author_id, "post_count", -1)
+        CounterService.change(instance.author_id, "post_count", 1)
+        AuthorHeaderCache.invalidate(previous_author_id)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_author_post(sender, instance, **kwargs):
+    """Уменьшает счетчик постов автора при удалении поста."""
+    CounterService.change(instance.author_id, "post_count", -1)
+
+
+@receiver(post_save, sender=Subscription)
+def count_subscription(sender, instance, created, raw, **kwargs):
+    """Увеличивает счетчик подписок пользователя при оформлении подписки."""
+    if created and not raw:
+        CounterService.change(instance.user_id, "subscription_count", 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def uncount_subscription(sender, instance, **kwargs):
+    """Уменьшает счетчик подписок пользователя при удалении подписки."""
+    CounterService.change(instance.user_id, "subscription_count", -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def reset_post_pages(sender, instance, signal, **kwargs):
+    """
+    Сбрасывает закешированные страницы, на которых выводится пост.
+
+    Флаг _moves_in_lists остается на экземпляре после сохранения, поэтому
+    учитывается только для post_save: удаление всегда сдвигает списки.
+    """
+    if signal is post_delete or getattr(instance, "_moves_in_lists", True):
+        # Новый, удаленный или переместившийся пост сдвигает все страницы
+        ResponseCache.invalidate(ResponseCache.POSTS_TAG)
+    else:
+        ResponseCache.invalidate(f"post:{instance.pk}")
@@ -1,10 +1,38 @@
 from django import template
+from django.utils.safestring import mark_safe
+
+from post.services import PostCardCache, PostSearchService
+from post.thumbnails import thumbnail_name
 
 register = template.Library()
 
 
 @register.filter()
-def media_filter(path):
+def media_filter(path, size=None):
+    """
+    Ссылка на медиафайл.
+
+    С аргументом размера возвращает превью: "140" - в запасном формате,
+    "140.webp" - в WebP.
+    """
     if path:
+        if size:
+            size, _, extension = str(size).partition(".")
+            path = thumbnail_name(str(path), size, extension or None)
         return f"/media/{path}"
     return "#"
+
+
+@register.filter()
+def highlight(headline):
+    """Фрагмент результата поиска с выделенными совпадениями."""
+    return mark_safe(PostSearchService.highlight(headline))
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка поста: берется из подготовленных в контроллере или из кеша."""
+    cards = context.get("post_cards") or {}
+    if post.pk not in cards:
+        cards = PostCardCache.render_many([post], context.request.user)
+    return mark_safe(cards[post.pk])
@@ -1,13 +1,139 @@
+import base64
+import csv
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
 from unittest.mock import patch
+from urllib.parse import parse_qs
 
-from django.test import TestCase
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
 
-from post.models import Post, Subscription
-from post.services import SubscriptionService
+from post import benchmark
+from post.checks import check_shared_cache
+from post.metrics import _new_view, registry
+from post.models import (NOT_FREE, ImportCheckpoint, Post, SlowRequest,
+                         StripeEvent, StripePrice, Subscription)
+from post.paginators import KeysetPaginator
+from post.profiling import Sampler, SampleRate
+from post.seeding import Seeder
+from post.services import (CounterService, EntitlementService, PostCardCache,
+                           PostSearchService, PriceCatalog, ResponseCache,
+                           SlowRequestService, StripeEventService,
+                           SubscriptionExportService, SubscriptionService)
+from post.thumbnails import thumbnail_name
+from post.views import (ChooseSubView, IndexView, PaymentView, PostDetailView,
+                        PostListView, PostSearchView)
 from users.models import User
 
 
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """Локальная имитация API Stripe для цен и сессий оплаты."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {
+            key: values[0]
+            for key, values in parse_qs(self.rfile.read(length).decode()).items()
+        }
+        self.server.requests.append((self.path, form))
+        number = len(self.server.requests)
+        if self.path == "/v1/prices":
+            body = {"id": f"price_{number}", "object": "price", **form}
+        elif self.path == "/v1/checkout/sessions":
+            body = {
+                "id": f"cs_test_{number}",
+                "object": "checkout.session",
+                "url": f"https://checkout.stripe.test/cs_test_{number}",
+                "expires_at": int(time.time()) + 24 * 60 * 60,
+            }
+        elif self.path.startswith("/v1/checkout/sessions/"):
+            body = {
+                "id": self.path.split("/")[4],
+                "object": "checkout.session",
+                "status": "expired",
+            }
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeStripeMixin:
+    """Направляет запросы к Stripe на локальный сервер на время теста."""
+
+    def setUp(self):
+        super().setUp()
+        self.stripe_server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+        self.stripe_server.requests = []
+        threading.Thread(target=self.stripe_server.serve_forever, daemon=True).start()
+        host, port = self.stripe_server.server_address
+        for attribute, value in (
+            ("api_base", f"http://{host}:{port}"),
+            ("api_key", "sk_test_fake"),
+        ):
+            patcher = patch.object(stripe, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.stripe_server.server_close)
+        self.addCleanup(self.stripe_server.shutdown)
+
+    def stripe_requests(self, path):
+        """Возвращает запросы к Stripe по указанному пути."""
+        return [
+            form
+            for request_path, form in self.stripe_server.requests
+            if request_path == path
+        ]
+
+
+def make_image(name="preview.jpg", size=(800, 600), image_format="JPEG"):
+    """Создает загружаемое изображение для тестов."""
+    buffer = BytesIO()
+    Image.new("RGB", size, "#28a745").save(buffer, format=image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class TemporaryMediaMixin:
+    """Сохраняет загруженные файлы во временный MEDIA_ROOT на время теста."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
 class PostTestCase(TestCase):
     """Тесты для проверки функционала связанного с постами."""
 
@@ -99,12 +225,150 @@ class PostTestCase(TestCase):
         titles = [post.title for post in response.context["post_list"]]
         self.assertEqual(titles, ["1Post 1", "2Post 3", "3Post 2", "Test title"])
 
+    def test_post_list_keyset_pagination(self):
+        """Тестирование курсорной пагинации списка постов вперед и назад."""
+        url = reverse("post:post-list")
+        Post.objects.create(title="Free", author=self.user, is_free=True)
+        for title in ("A", "B", "B", "C"):
+            Post.objects.create(title=title, author=self.user)
+        expected = list(
+            Post.objects.order_by("-is_free", "title", "id").values_list(
+                "id", flat=True
+            )
+        )
+
+        seen, pages, params = [], [], {"page_size": 2}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.context["page_obj"]
+            pages.append(page)
+            seen.extend(post.id for post in page)
+            if not page.has_next():
+                break
+            params = {"page_size": 2, "cursor": page.next_cursor}
+
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous())
+
+        response = self.client.get(
+            url, {"page_size": 2, "cursor": pages[-1].previous_cursor}
+        )
+        self.assertEqual(
+            [post.id for post in response.context["page_obj"]],
+            [post.id for post in pages[-2]],
+        )
+
+    def test_post_list_seek_uses_index(self):
+        """Тестирование того, что курсор - условие индекса, а не фильтр."""
+        paginator = KeysetPaginator(
+            Post.objects.annotate(not_free=NOT_FREE), PostListView.ordering, 9
+        )
+        queryset = paginator.queryset.order_by(*paginator.ordering).filter(
+            paginator._seek_filter([False, "Test", 1], reverse=False)
+        )
+        with connection.cursor() as cursor:
+            # На нескольких строках планировщик иначе выбрал бы полный просмотр
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_sort = off")
+            plan = queryset[:10].explain()
+
+        self.assertIn("post_list_keyset_idx", plan)
+        self.assertIn("Index Cond: (ROW((NOT is_free)", plan)
+        self.assertNotIn("Filter", plan)
+
+    def test_author_indexes_not_duplicated(self):
+        """Тестирование того, что author_id ведет только составные индексы."""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table
+            )
+        indexes = sorted(
+            name
+            for name, constraint in constraints.items()
+            if constraint["index"] and constraint["columns"][:1] == ["author_id"]
+        )
+
+        self.assertEqual(indexes, ["post_author_created_idx", "post_author_id_idx"])
+
+    def test_post_list_invalid_cursor(self):
+        """Тестирование ответа на поврежденный курсор."""
+        url = reverse("post:post-list")
+        response = self.client.get(url, {"cursor": "broken"})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_list_cursor_value_types(self):
+        """Тестирование ответа на курсор со значениями не тех типов."""
+        url = reverse("post:post-list")
+        for values in (
+            [True, {"a": 1}, 1],
+            [{"a": 1}, "title", 2],
+            [True, "title", "abc"],
+            [True, None, 3],
+            [True, ["title"], 3],
+        ):
+            payload = json.dumps(["n", values]).encode()
+            cursor = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, values)
+
+
+class QueryBudgetTestCase(TestCase):
+    """Тесты количества SQL-запросов в контроллерах постов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.user = User.objects.create(phone=80297777777, password="test")
+        Subscription.objects.create(user=self.user, type_of_sub="one_month")
+        for number in range(30):
+            author = User.objects.create(
+                phone=f"8029{number}", email=f"author{number}@test.com"
+            )
+            Post.objects.create(author=author, title=f"Post {number}")
+        self.client.force_login(self.user)
+
+    def assertWithinBudget(self, url, view_class):
+        """Проверяет, что контроллер укладывается в заявленный бюджет запросов."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(context.captured_queries),
+            view_class.query_budget,
+            "\n".join(query["sql"] for query in context.captured_queries),
+        )
+
+    def test_index_view_budget(self):
+        """Тестирование бюджета запросов главной страницы."""
+        self.assertWithinBudget(reverse("post:index"), IndexView)
+
+    def test_post_list_budget(self):
+        """Тестирование бюджета запросов списка постов."""
+        self.assertWithinBudget(
+            reverse("post:post-list") + "?page_size=30", PostListView
+        )
+
+    def test_post_detail_budget(self):
+        """Тестирование бюджета запросов страницы поста."""
+        post = Post.objects.last()
+        self.assertWithinBudget(
+            reverse("post:post-detail", args=(post.pk,)), PostDetailView
+        )
+
+    def test_post_search_budget(self):
+        """Тестирование бюджета запросов страницы поиска."""
+        self.assertWithinBudget(reverse("post:post-search") + "?q=post", PostSearchView)
+
 
 class ChooseSubViewTestCase(TestCase):
     """Тесты для проверки функционала связанного с выбором подписки."""
 
     def setUp(self):
         """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
         self.user = User.objects.create(
             phone=80297777777,
             email="test@tesov.com",
@@ -162,23 +426,107 @@ class PaymentViewTests(TestCase):
         )
 
     # Изолирование тестового кода от реальных функций Stripe API
-    @patch("post.views.create_stripe_session")
-    @patch("post.views.get_stripe_price")
-    def test_get_payment_view(self, mock_get_stripe_price, mock_create_stripe_session):
+    @patch("post.views.acreate_stripe_session")
+    @patch("post.views.PriceCatalog.aget_subscription_price_id")
+    def test_get_payment_view(self, mock_get_price_id, mock_create_stripe_session):
         """Тестирование GET-запроса страницы оплаты подписки."""
         # Создание объектов, которые будут использоваться вместо оригинальных функций в тесте
-        mock_get_stripe_price.return_value = {"id": "price_123", "amount": 1000}
-        mock_create_stripe_session.return_value = ("session_id", "payment_link")
+        mock_get_price_id.return_value = "price_123"
+        mock_create_stripe_session.return_value = (
+            "session_id",
+            "payment_link",
+            None,
+        )
         url = reverse("post:subscription-payment", args=(self.subscription.pk,))
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "post/payment.html")
         self.subscription.refresh_from_db()
-        self.assertTrue(self.subscription.is_paid)
+        # Оплата подтверждается только вебхуком Stripe
+        self.assertFalse(self.subscription.is_paid)
         self.assertTrue(self.subscription.is_active)
         self.assertIn("subscription", response.context)
 
 
+class PaymentSessionReuseTests(FakeStripeMixin, TestCase):
+    """Тесты переиспользования открытой сессии оплаты."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        super().setUp()
+        PriceCatalog.clear()
+        self.addCleanup(PriceCatalog.clear)
+        self.user = User.objects.create(
+            phone=80297777777,
+            email="test@tesov.com",
+            password="test",
+        )
+        self.client.force_login(self.user)
+        self.subscription = Subscription.objects.create(
+            user=self.user, type_of_sub="one_month", is_paid=False
+        )
+        self.url = reverse("post:subscription-payment", args=(self.subscription.pk,))
+
+    def test_open_session_reused(self):
+        """Тестирование повторной загрузки страницы оплаты без запросов к Stripe."""
+        self.client.get(self.url)
+        self.subscription.refresh_from_db()
+        self.assertIsNotNone(self.subscription.session_expires_at)
+
+        for _ in range(3):
+            response = self.client.get(self.url)
+            self.assertEqual(response.context["payment_link"], self.subscription.link)
+
+        self.assertEqual(len(self.stripe_requests("/v1/checkout/sessions")), 1)
+
+    def test_paid_subscription_redirected(self):
+        """Тестирование перенаправления с оплаты уже оплаченной подписки."""
+        Subscription.objects.filter(pk=self.subscription.pk).update(is_paid=True)
+
+        response = self.client.get(self.url)
+
+        self.assertRedirects(response, reverse("post:sub-success"))
+        self.assertEqual(self.stripe_server.requests, [])
+
+    async def test_payment_view_is_async(self):
+        """Тестирование страницы оплаты через асинхронный клиент."""
+        self.assertTrue(PaymentView.view_is_async)
+        self.assertTrue(ChooseSubView.view_is_async)
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.stripe_requests("/v1/checkout/sessions")), 1)
+
+    def test_expired_session_recreated(self):
+        """Тестирование создания новой сессии после истечения старой."""
+        self.client.get(self.url)
+        Subscription.objects.filter(pk=self.subscription.pk).update(
+            session_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.client.get(self.url)
+
+        self.assertEqual(len(self.stripe_requests("/v1/checkout/sessions")), 2)
+
+    def test_plan_change_recreates_session(self):
+        """Тестирование создания новой сессии после смены тарифа."""
+        self.client.get(self.url)
+        Subscription.objects.filter(pk=self.subscription.pk).update(is_paid=False)
+        SubscriptionService.create_or_update_subscription(self.user, "one_year")
+        self.client.get(self.url)
+
+        sessions = self.stripe_requests("/v1/checkout/sessions")
+        self.assertEqual(len(sessions), 2)
+        self.assertNotEqual(
+            sessions[0]["line_items[0][price]"], sessions[1]["line_items[0][price]"]
+        )
+        # Сессия прежнего тарифа закрыта, по старой ссылке заплатить нельзя
+        self.assertEqual(
+            len(self.stripe_requests("/v1/checkout/sessions/cs_test_2/expire")), 1
+        )
+
+
 class SubConfirmSuccessViewTests(TestCase):
     """Тесты для проверки представления успешного подтверждения подписки."""
 
@@ -202,6 +550,7 @@ class SubscriptionServiceTests(TestCase):
 
     def setUp(self):
         """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
         self.user = User.objects.create(
             phone=80297777777,
             email="test@testov.com",
@@ -259,3 +608,1616 @@ class SubscriptionServiceTests(TestCase):
 
         # Проверяем, что метод возвращает ту же подписку, если она уже существует
         self.assertEqual(subscription, updated_subscription)
+
+
+class EntitlementServiceTests(TestCase):
+    """Тесты для проверки кеширования статуса подписки."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.user = User.objects.create(
+            phone=80297777777,
+            email="test@testov.com",
+            password="test",
+        )
+
+    def test_status_is_cached(self):
+        """Тестирование того, что повторный запрос статуса не обращается к БД."""
+        with self.assertNumQueries(1):
+            status = EntitlementService.get_status(self.user)
+        self.assertFalse(status["is_paid"])
+
+        with self.assertNumQueries(0):
+            EntitlementService.get_status(self.user)
+            SubscriptionService.has_active_subscription(self.user)
+
+    def test_status_reset_on_save_and_delete(self):
+        """Тестирование сброса кеша при сохранении и удалении подписки."""
+        self.assertFalse(EntitlementService.get_status(self.user)["is_paid"])
+
+        subscription = Subscription.objects.create(
+            user=self.user, type_of_sub="one_month", is_paid=True
+        )
+        status = EntitlementService.get_status(self.user)
+        self.assertTrue(status["is_paid"])
+        self.assertEqual(status["id"], subscription.id)
+
+        subscription.delete()
+        self.assertFalse(EntitlementService.get_status(self.user)["is_paid"])
+
+    def test_context_processor_uses_cache(self):
+        """Тестирование статуса подписки в шаблонах без лишних запросов."""
+        Subscription.objects.create(
+            user=self.user, type_of_sub="one_month", is_paid=True
+        )
+        self.client.force_login(self.user)
+        self.client.get(reverse("post:index"))
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("post:index"))
+        self.assertContains(response, "Подписан")
+        self.assertFalse(
+            any(
+                "post_subscription" in query["sql"]
+                for query in context.captured_queries
+            )
+        )
+
+    def test_deploy_requires_shared_cache(self):
+        """Тестирование запрета локального кеша процесса при check --deploy."""
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ["post.E001"]
+        )
+        redis = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://redis:6379/1",
+            }
+        }
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class PostCardCacheTests(TestCase):
+    """Тесты кеширования карточек постов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.author = User.objects.create(
+            phone=80291111111, email="author@test.com", is_author=True
+        )
+        self.reader = User.objects.create(phone=80292222222, email="reader@test.com")
+        self.post = Post.objects.create(
+            author=self.author, title="Закрытый пост", is_free=False
+        )
+
+    def render(self, user):
+        """Отрисовывает карточку поста для пользователя."""
+        return PostCardCache.render_many([self.post], user)[self.post.pk]
+
+    def test_card_depends_on_tier(self):
+        """Тестирование разных карточек для автора, подписчика и гостя."""
+        self.assertNotIn("Закрытый пост", self.render(self.reader))
+
+        author_card = self.render(self.author)
+        self.assertIn("Закрытый пост", author_card)
+        self.assertIn("Редактировать", author_card)
+
+        Subscription.objects.create(
+            user=self.reader, type_of_sub="one_month", is_paid=True
+        )
+        subscriber_card = self.render(self.reader)
+        self.assertIn("Закрытый пост", subscriber_card)
+        self.assertNotIn("Редактировать", subscriber_card)
+
+    def test_card_is_cached(self):
+        """Тестирование повторной выдачи карточки из кеша без отрисовки."""
+        self.render(self.author)
+
+        with patch("post.services.render_to_string") as render_mock:
+            self.assertIn("Закрытый пост", self.render(self.author))
+        render_mock.assert_not_called()
+
+    def test_card_reset_on_save_and_delete(self):
+        """Тестирование сброса карточки при изменении и удалении поста."""
+        self.render(self.author)
+        previous_key = PostCardCache.cache_key(
+            self.post.pk, self.post.updated_at, PostCardCache.AUTHOR
+        )
+        self.assertIsNotNone(cache.get(previous_key))
+
+        self.post.title = "Новое название"
+        self.post.save()
+        self.assertIsNone(cache.get(previous_key))
+        self.assertIn("Новое название", self.render(self.author))
+
+        key = PostCardCache.cache_key(
+            self.post.pk, self.post.updated_at, PostCardCache.AUTHOR
+        )
+        self.assertIsNotNone(cache.get(key))
+        self.post.delete()
+        self.assertIsNone(cache.get(key))
+
+    def test_post_list_uses_cached_cards(self):
+        """Тестирование списка постов с карточками из кеша."""
+        self.client.force_login(self.author)
+        self.client.get(reverse("post:post-list"))
+
+        with patch("post.services.render_to_string") as render_mock:
+            response = self.client.get(reverse("post:post-list"))
+        render_mock.assert_not_called()
+        self.assertContains(response, "Закрытый пост")
+
+
+class ResponseCacheTests(TestCase):
+    """Тесты кеширования страниц для анонимных посетителей."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.author = User.objects.create(
+            phone=80291111111, email="author@test.com", is_author=True
+        )
+        self.other_author = User.objects.create(
+            phone=80292222222, email="other@test.com", is_author=True
+        )
+        self.post = Post.objects.create(
+            author=self.author, title="Первый пост", is_free=True
+        )
+        self.other_post = Post.objects.create(
+            author=self.other_author, title="Второй пост", is_free=True
+        )
+        self.url = reverse("post:post-list") + "?page_size=1"
+
+    def test_anonymous_page_is_cached(self):
+        """Тестирование выдачи страницы из кеша без запросов к БД."""
+        response = self.client.get(reverse("post:index"))
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("post:index"))
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertContains(response, "Первый пост")
+        self.assertEqual(ResponseCache.stats()["hits"], 1)
+        self.assertEqual(ResponseCache.stats()["misses"], 1)
+
+    def test_authenticated_page_is_not_cached(self):
+        """Тестирование обхода кеша для вошедших пользователей."""
+        self.client.force_login(self.author)
+        self.client.get(reverse("post:index"))
+        response = self.client.get(reverse("post:index"))
+
+        self.assertNotIn("X-Cache", response)
+
+    def test_post_change_purges_only_its_pages(self):
+        """Тестирование сброса только тех страниц, где выводится пост."""
+        other_page = self.client.get(self.url)
+        self.assertContains(other_page, "Второй пост")
+        next_url = self.url + "&cursor=" + other_page.context["page_obj"].next_cursor
+        self.assertContains(self.client.get(next_url), "Первый пост")
+
+        self.post.description = "Новое описание"
+        self.post.save()
+
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(next_url)["X-Cache"], "MISS")
+
+    def test_new_post_purges_all_pages(self):
+        """Тестирование сброса всех страниц при появлении нового поста."""
+        self.client.get(self.url)
+        Post.objects.create(author=self.author, title="Третий пост", is_free=True)
+
+        response = self.client.get(reverse("post:index"))
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "Третий пост")
+
+    def test_author_change_purges_author_pages(self):
+        """Тестирование сброса страниц с постами автора при изменении автора."""
+        other_page = self.client.get(self.url)
+        next_url = self.url + "&cursor=" + other_page.context["page_obj"].next_cursor
+        self.client.get(next_url)
+
+        self.author.first_name = "Иван"
+        self.author.save()
+
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(next_url)["X-Cache"], "MISS")
+
+    def test_deleted_post_purges_all_pages(self):
+        """Тестирование сброса всех страниц при удалении ранее сохраненного поста."""
+        self.client.get(self.url)
+        self.post.description = "Новое описание"
+        self.post.save()
+        self.client.get(self.url)
+
+        self.post.delete()
+
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+
+    def test_change_during_render_is_not_cached(self):
+        """Тестирование отказа от кеширования страницы, устаревшей во время отрисовки."""
+        post_tags = ResponseCache.post_tags
+
+        def change_post(posts):
+            tags = post_tags(posts)
+            self.post.description = "Новое описание"
+            self.post.save()
+            return tags
+
+        with patch.object(ResponseCache, "post_tags", side_effect=change_post):
+            self.client.get(reverse("post:index"))
+
+        response = self.client.get(reverse("post:index"))
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(reverse("post:index"))["X-Cache"], "HIT")
+
+
+class PostSearchTests(TestCase):
+    """Тесты полнотекстового поиска по постам."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.author = User.objects.create(
+            phone=80291111111, email="author@test.com", is_author=True
+        )
+        self.reader = User.objects.create(phone=80292222222, email="reader@test.com")
+        self.title_post = Post.objects.create(
+            author=self.author,
+            title="Рисование акварелью",
+            description="Основы работы с кистью",
+            is_free=True,
+        )
+        self.description_post = Post.objects.create(
+            author=self.author,
+            title="Заметки художника",
+            description="Сегодня снова рисовал акварелью пейзажи & портреты",
+            is_free=True,
+        )
+        self.paid_post = Post.objects.create(
+            author=self.author,
+            title="Секреты акварели",
+            description="Закрытый урок",
+            is_free=False,
+        )
+
+    def search(self, text, user):
+        """Возвращает id найденных постов в порядке выдачи."""
+        return [post.pk for post in PostSearchService.search(text, user)]
+
+    def test_ranked_and_stemmed(self):
+        """Тестирование морфологии и ранжирования: совпадение в заголовке выше."""
+        self.assertEqual(
+            self.search("акварель", self.reader),
+            [self.title_post.pk, self.description_post.pk],
+        )
+        self.assertEqual(self.search("painting", self.reader), [])
+
+        Post.objects.filter(pk=self.title_post.pk).update(
+            description="Watercolor painting basics"
+        )
+        self.assertEqual(self.search("paintings", self.reader), [self.title_post.pk])
+
+    def test_paid_posts_hidden(self):
+        """Тестирование доступа к платным постам в результатах поиска."""
+        self.assertNotIn(self.paid_post.pk, self.search("акварель", self.reader))
+        self.assertIn(self.paid_post.pk, self.search("акварель", self.author))
+
+        Subscription.objects.create(
+            user=self.reader, type_of_sub="one_month", is_paid=True
+        )
+        self.assertIn(self.paid_post.pk, self.search("акварель", self.reader))
+
+    def test_headline_is_escaped(self):
+        """Тестирование выделения совпадений с экранированием текста поста."""
+        response = self.client.get(reverse("post:post-search"), {"q": "рисовать"})
+
+        self.assertContains(response, "<mark>рисовал</mark>")
+        self.assertContains(response, "пейзажи &amp; портреты")
+        self.assertNotContains(response, "Секреты акварели")
+
+    def test_search_api(self):
+        """Тестирование API поиска."""
+        response = self.client.get(reverse("post:api-post-search"), {"q": "акварель"})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["id"] for result in results],
+            [self.title_post.pk, self.description_post.pk],
+        )
+        self.assertIn("<mark>акварелью</mark>", results[1]["headline"])
+
+    def test_empty_query(self):
+        """Тестирование пустого запроса."""
+        response = self.client.get(reverse("post:api-post-search"))
+
+        self.assertEqual(response.json()["count"], 0)
+
+
+class PostAPITests(TestCase):
+    """Тесты API постов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.client = APIClient()
+        self.author = User.objects.create(
+            phone=80291111111, email="author@test.com", is_author=True
+        )
+        self.reader = User.objects.create(phone=80292222222, email="reader@test.com")
+        self.free_posts = [
+            Post.objects.create(
+                author=self.author, title=f"Пост {number}", is_free=True
+            )
+            for number in range(3)
+        ]
+        self.paid_post = Post.objects.create(
+            author=self.author, title="Платный пост", is_free=False
+        )
+        self.list_url = reverse("post:api-post-list")
+
+    def test_list_respects_access(self):
+        """Тестирование списка: платные посты видны только автору и подписчикам."""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url)
+        ids = [post["id"] for post in response.json()["results"]]
+        self.assertEqual(ids, [post.pk for post in reversed(self.free_posts)])
+
+        self.client.force_authenticate(self.author)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.json()["results"][0]["id"], self.paid_post.pk)
+
+    def test_cursor_pagination(self):
+        """Тестирование курсорной пагинации."""
+        response = self.client.get(self.list_url, {"page_size": 2})
+        data = response.json()
+        self.assertEqual(len(data["results"]), 2)
+
+        response = self.client.get(data["next"])
+        ids = [post["id"] for post in response.json()["results"]]
+        self.assertEqual(ids, [self.free_posts[0].pk])
+        self.assertIsNone(response.json()["next"])
+
+    def test_sparse_fields(self):
+        """Тестирование выбора выводимых полей."""
+        response = self.client.get(self.list_url, {"fields": "id,title"})
+        self.assertEqual(set(response.json()["results"][0]), {"id", "title"})
+
+        response = self.client.get(self.list_url, {"fields": "id,password"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_respects_access(self):
+        """Тестирование доступа к платному посту."""
+        url = reverse("post:api-post-detail", args=(self.paid_post.pk,))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        Subscription.objects.create(
+            user=self.reader, type_of_sub="one_month", is_paid=True
+        )
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "Платный пост")
+
+    def test_conditional_get(self):
+        """Тестирование ответов 304 по ETag и Last-Modified."""
+        url = reverse("post:api-post-detail", args=(self.free_posts[0].pk,))
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            self.list_url,
+            HTTP_IF_MODIFIED_SINCE=self.client.get(self.list_url)["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+        self.free_posts[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class ConditionalResponseTests(TestCase):
+    """Тесты условных запросов к страницам постов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.author = User.objects.create(
+            phone=80291111111, email="author@test.com", is_author=True
+        )
+        self.reader = User.objects.create(phone=80292222222, email="reader@test.com")
+        self.posts = [
+            Post.objects.create(
+                author=self.author, title=f"Пост {number}", is_free=True
+            )
+            for number in range(3)
+        ]
+        self.detail_url = reverse("post:post-detail", args=(self.posts[0].pk,))
+        self.list_url = reverse("post:post-list")
+
+    def test_timestamps(self):
+        """Тестирование дат создания и изменения поста."""
+        post = self.posts[0]
+        created_at = post.created_at
+        post.save()
+
+        self.assertEqual(post.created_at, created_at)
+        self.assertGreater(post.updated_at, created_at)
+
+    def test_detail_not_modified(self):
+        """Тестирование ответа 304 для неизмененного поста."""
+        response = self.client.get(self.detail_url)
+        self.assertIn("Last-Modified", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.author.last_name = "Иванов"
+        self.author.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Иванов")
+
+    def test_detail_depends_on_viewer(self):
+        """Тестирование новой версии страницы после входа пользователя."""
+        etag = self.client.get(self.detail_url)["ETag"]
+
+        self.client.force_login(self.reader)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_new_login_not_modified(self):
+        """Тестирование новой версии страницы после повторного входа."""
+        self.reader.set_password("password")
+        self.reader.save()
+        credentials = {"username": self.reader.phone, "password": "password"}
+        self.client.post(reverse("users:login"), credentials)
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+        self.assertEqual(
+            self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        self.client.post(reverse("users:logout"))
+        self.client.post(reverse("users:login"), credentials)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_not_modified(self):
+        """Тестирование ответа 304 для неизмененного списка постов."""
+        self.client.force_login(self.reader)
+        etag = self.client.get(self.list_url)["ETag"]
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.posts[1].title = "Новое название"
+        self.posts[1].save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.posts[0].delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_page_not_modified(self):
+        """Тестирование ответа 304 из кеша страниц без запросов к БД."""
+        etag = self.client.get(self.list_url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class PriceCatalogTests(FakeStripeMixin, TestCase):
+    """Тесты для проверки каталога цен Stripe."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        super().setUp()
+        PriceCatalog.clear()
+        self.addCleanup(PriceCatalog.clear)
+
+    def test_price_created_once(self):
+        """Тестирование того, что цена создается в Stripe только один раз."""
+        price_id = PriceCatalog.get_price_id("one_month", 1500, 1)
+        self.assertEqual(PriceCatalog.get_price_id("one_month", 1500, 1), price_id)
+
+        prices = self.stripe_requests("/v1/prices")
+        self.assertEqual(len(prices), 1)
+        self.assertEqual(prices[0]["unit_amount"], "150000")
+        self.assertEqual(prices[0]["recurring[interval_count]"], "1")
+        self.assertEqual(StripePrice.objects.get().price_id, price_id)
+
+    def test_price_loaded_from_database(self):
+        """Тестирование получения цены из БД после сброса кеша процесса."""
+        price_id = PriceCatalog.get_price_id("one_year", 10000, 12)
+        PriceCatalog.clear()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(PriceCatalog.get_price_id("one_year", 10000, 12), price_id)
+        self.assertEqual(len(self.stripe_requests("/v1/prices")), 1)
+
+    def test_warm_prices_command(self):
+        """Тестирование команды предварительного создания цен."""
+        call_command("warm_prices", stdout=StringIO())
+        call_command("warm_prices", stdout=StringIO())
+
+        self.assertEqual(StripePrice.objects.count(), len(Subscription.SUB_CHOICES))
+        self.assertEqual(
+            len(self.stripe_requests("/v1/prices")), len(Subscription.SUB_CHOICES)
+        )
+
+
+@patch("post.services.STRIPE_WEBHOOK_SECRET", "whsec_test")
+class StripeWebhookTests(TestCase):
+    """Тесты приема и пакетной обработки вебхуков Stripe."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        with open(settings.BASE_DIR / "fixtures" / "stripe_events.json") as file:
+            self.events = json.load(file)
+        self.user = User.objects.create(phone=80297777777, email="test@tesov.com")
+        self.paid = Subscription.objects.create(
+            user=self.user, type_of_sub="one_month", session_id="cs_test_a1paid"
+        )
+        self.expired = Subscription.objects.create(
+            user=User.objects.create(phone=80291111111, email="other@tesov.com"),
+            type_of_sub="one_year",
+            session_id="cs_test_b2expired",
+            link="https://checkout.stripe.test/cs_test_b2expired",
+        )
+        self.url = reverse("post:stripe-webhook")
+
+    def send(self, event, secret="whsec_test"):
+        """Отправляет событие на вебхук с подписью Stripe."""
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+        return self.client.post(
+            self.url,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+        )
+
+    def test_invalid_signature_rejected(self):
+        """Тестирование отказа для события с неверной подписью."""
+        response = self.send(self.events[0], secret="whsec_wrong")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(StripeEvent.objects.count(), 0)
+
+    def test_duplicate_events_dropped(self):
+        """Тестирование того, что повторная доставка события не создает дубликат."""
+        for event in self.events + self.events:
+            self.assertEqual(self.send(event).status_code, 200)
+
+        self.assertEqual(StripeEvent.objects.count(), len(self.events))
+        self.paid.refresh_from_db()
+        self.assertFalse(self.paid.is_paid)
+
+    def test_events_applied_in_batch(self):
+        """Тестирование применения накопленных событий к подпискам."""
+        self.assertFalse(SubscriptionService.has_active_subscription(self.user))
+        for event in self.events:
+            self.send(event)
+
+        with self.assertNumQueries(7):
+            processed = StripeEventService.process_batch()
+        self.assertEqual(processed, len(self.events))
+
+        self.paid.refresh_from_db()
+        self.assertTrue(self.paid.is_paid)
+        self.assertEqual(self.paid.start_date.isoformat(), "2024-11-20T00:00:00+00:00")
+        self.assertEqual(self.paid.end_date.isoformat(), "2024-12-20T00:00:00+00:00")
+        self.assertTrue(SubscriptionService.has_active_subscription(self.user))
+
+        self.expired.refresh_from_db()
+        self.assertFalse(self.expired.is_paid)
+        self.assertIsNone(self.expired.session_id)
+        self.assertIsNone(self.expired.link)
+
+        self.assertFalse(StripeEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertFalse(StripeEvent.objects.filter(is_unmatched=True).exists())
+        self.assertEqual(StripeEventService.process_batch(), 0)
+
+    def test_process_command(self):
+        """Тестирование команды обработки событий небольшими пачками."""
+        for event in self.events:
+            self.send(event)
+        out = StringIO()
+
+        call_command("process_stripe_events", batch_size=1, stdout=out)
+
+        self.assertIn(str(len(self.events)), out.getvalue())
+        self.paid.refresh_from_db()
+        self.assertTrue(self.paid.is_paid)
+
+    def test_unmatched_payment_flagged(self):
+        """Тестирование пометки и логирования оплаты, не найденной среди подписок."""
+        Subscription.objects.filter(pk=self.paid.pk).update(session_id="cs_test_new")
+        self.send(self.events[0])
+
+        with self.assertLogs("post.services", "ERROR") as logs:
+            StripeEventService.process_batch()
+
+        event = StripeEvent.objects.get()
+        self.assertTrue(event.is_unmatched)
+        self.assertIn(self.events[0]["id"], logs.output[0])
+        self.assertIn("cs_test_a1paid", logs.output[0])
+        self.paid.refresh_from_db()
+        self.assertFalse(self.paid.is_paid)
+
+
+class ExpireSubscriptionsCommandTests(TestCase):
+    """Тесты команды деактивации истекших подписок."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.user = User.objects.create(phone=80297777777, email="test@tesov.com")
+        now = timezone.now()
+        self.expired = Subscription.objects.create(
+            user=self.user, type_of_sub="one_month", is_paid=True
+        )
+        self.current = Subscription.objects.create(
+            user=User.objects.create(phone=80291111111, email="other@tesov.com"),
+            type_of_sub="one_year",
+            is_paid=True,
+        )
+        self.pending = Subscription.objects.create(
+            user=self.user, type_of_sub="one_month", is_paid=False
+        )
+        Subscription.objects.filter(pk=self.expired.pk).update(
+            start_date=now - timedelta(days=45)
+        )
+        Subscription.objects.filter(pk=self.current.pk).update(
+            start_date=now - timedelta(days=45)
+        )
+
+    def test_get_end_date(self):
+        """Тестирование расчета даты окончания с учетом длины месяца."""
+        start = timezone.datetime(2024, 1, 31, tzinfo=timezone.get_current_timezone())
+        self.assertEqual(
+            SubscriptionService.get_end_date(start, "one_month").date().isoformat(),
+            "2024-02-29",
+        )
+        self.assertEqual(
+            SubscriptionService.get_end_date(start, "one_year").date().isoformat(),
+            "2025-01-31",
+        )
+
+    def test_expire_subscriptions(self):
+        """Тестирование проставления дат окончания и деактивации порциями."""
+        self.assertTrue(SubscriptionService.has_active_subscription(self.user))
+        out = StringIO()
+
+        call_command("expire_subscriptions", chunk_size=1, stdout=out)
+
+        self.assertIn(
+            "Проставлено дат окончания: 2, деактивировано подписок: 1", out.getvalue()
+        )
+        self.expired.refresh_from_db()
+        self.current.refresh_from_db()
+        self.pending.refresh_from_db()
+        self.assertFalse(self.expired.is_active)
+        self.assertTrue(self.current.is_active)
+        self.assertIsNotNone(self.current.end_date)
+        self.assertTrue(self.pending.is_active)
+        self.assertIsNone(self.pending.end_date)
+        self.assertFalse(SubscriptionService.has_active_subscription(self.user))
+
+        call_command("expire_subscriptions", stdout=out)
+        self.assertIn(
+            "Проставлено дат окончания: 0, деактивировано подписок: 0", out.getvalue()
+        )
+
+
+class SubscriptionExportTests(TestCase):
+    """Тесты потоковой выгрузки подписок."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        self.staff = User.objects.create(
+            phone=80290000000, email="staff@test.com", is_staff=True, is_superuser=True
+        )
+        self.user = User.objects.create(phone=80291111111, email="user@test.com")
+        self.old = Subscription.objects.create(
+            user=self.user, type_of_sub="one_month", is_paid=True
+        )
+        self.new = Subscription.objects.create(
+            user=self.user, type_of_sub="one_year", is_active=False
+        )
+        Subscription.objects.filter(pk=self.old.pk).update(
+            start_date=timezone.now() - timedelta(days=60)
+        )
+        self.url = reverse("admin:post_subscription_export")
+
+    def test_staff_only(self):
+        """Тестирование доступа к выгрузке только для персонала."""
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_csv(self):
+        """Тестирование выгрузки CSV с ценой подписки."""
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(response["X-Accel-Buffering"], "no")
+        rows = list(csv.DictReader(StringIO(response.getvalue().decode())))
+        self.assertEqual(
+            [row["id"] for row in rows], [str(self.old.pk), str(self.new.pk)]
+        )
+        self.assertEqual(rows[0]["price"], "1500")
+        self.assertEqual(rows[0]["phone"], "80291111111")
+        self.assertEqual(rows[1]["is_active"], "False")
+
+    def test_export_jsonl_date_range(self):
+        """Тестирование выгрузки JSON Lines за период."""
+        self.client.force_login(self.staff)
+        start = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.client.get(self.url, {"format": "jsonl", "start": start})
+
+        rows = [json.loads(line) for line in response.getvalue().decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], self.new.pk)
+        self.assertEqual(rows[0]["price"], 10000)
+
+        response = self.client.get(self.url, {"start": "01.01.2024"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_stream(self):
+        """Тестирование асинхронной выгрузки для ASGI."""
+        chunks = [chunk async for chunk in SubscriptionExportService.astream("csv")]
+
+        self.assertTrue(chunks[0].startswith("id,user_id"))
+        self.assertEqual("".join(chunks).count("\r\n"), 3)
+
+
+class ImportPostsCommandTests(TestCase):
+    """Тесты команды потокового импорта постов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.author = User.objects.create(
+            phone="80291111111", email="Author@test.com", is_author=True
+        )
+        self.records = [
+            {"title": f"Импорт {number}", "author_phone": "80291111111"}
+            for number in range(5)
+        ]
+        self.records[1] = {
+            "title": "Импорт по почте",
+            "description": "Строка 1\nСтрока 2, с запятой",
+            "is_free": True,
+            "author_email": "author@TEST.com",
+        }
+        self.records[3] = {"title": "Неизвестный автор", "author_phone": "0"}
+
+    def write_jsonl(self, records):
+        """Сохраняет записи в файл JSON Lines."""
+        path = os.path.join(self.directory, "posts.jsonl")
+        with open(path, "w", encoding="utf-8") as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return path
+
+    def import_posts(self, path, **options):
+        """Запускает импорт и возвращает его вывод."""
+        out = StringIO()
+        call_command("import_posts", path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_jsonl(self):
+        """Тестирование импорта через COPY и поиска по импортированным постам."""
+        out = self.import_posts(self.write_jsonl(self.records), batch_size=2)
+
+        self.assertIn("Импортировано постов: 4, пропущено записей: 1", out)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.post_count, 4)
+        post = Post.objects.get(title="Импорт по почте")
+        self.assertEqual(post.author, self.author)
+        self.assertEqual(post.description, "Строка 1\nСтрока 2, с запятой")
+        self.assertTrue(post.is_free)
+        self.assertIsNotNone(post.created_at)
+        self.assertEqual(
+            [post.pk for post in PostSearchService.search("запятой", self.author)],
+            [post.pk],
+        )
+
+    def test_import_csv_bulk_create(self):
+        """Тестирование импорта CSV через bulk_create."""
+        path = os.path.join(self.directory, "posts.csv")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(
+                file, fieldnames=("title", "description", "is_free", "author_phone")
+            )
+            writer.writeheader()
+            writer.writerow(
+                {"title": "Из CSV", "is_free": "да", "author_phone": "80291111111"}
+            )
+
+        self.import_posts(path, method="bulk")
+
+        self.assertTrue(Post.objects.get(title="Из CSV").is_free)
+
+    def test_resume_from_checkpoint(self):
+        """Тестирование продолжения импорта с контрольной точки."""
+        path = self.write_jsonl(self.records[:2])
+        self.import_posts(path)
+        self.assertEqual(
+            ImportCheckpoint.objects.get(name=os.path.abspath(path)).position, 2
+        )
+
+        self.write_jsonl(self.records)
+        out = self.import_posts(path)
+
+        self.assertIn("Продолжение с записи 3", out)
+        self.assertEqual(Post.objects.filter(title__startswith="Импорт").count(), 4)
+
+    def test_checkpoint_rolled_back_with_batch(self):
+        """Тестирование отката контрольной точки вместе с упавшей пачкой."""
+        path = self.write_jsonl(self.records)
+        add_posts = CounterService.add_posts
+        batches = []
+
+        def fail_second_batch(counts):
+            if batches:
+                raise DatabaseError("Сбой во время второй пачки")
+            batches.append(counts)
+            return add_posts(counts)
+
+        with patch.object(CounterService, "add_posts", side_effect=fail_second_batch):
+            with self.assertRaises(DatabaseError):
+                self.import_posts(path, batch_size=2)
+        self.assertEqual(
+            ImportCheckpoint.objects.get(name=os.path.abspath(path)).position, 2
+        )
+
+        out = self.import_posts(path, batch_size=2)
+
+        self.assertIn("Продолжение с записи 3", out)
+        self.assertEqual(Post.objects.filter(title__startswith="Импорт").count(), 4)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.post_count, 4)
+
+
+class CounterTests(TestCase):
+    """Тесты денормализованных счетчиков."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.author = User.objects.create(
+            phone="80291111111", email="author@test.com", is_author=True
+        )
+        self.other = User.objects.create(
+            phone="80292222222", email="other@test.com", is_author=True
+        )
+        self.post = Post.objects.create(author=self.author, title="Пост", is_free=True)
+
+    def assertCounts(self, user, **counts):
+        """Проверяет значения счетчиков пользователя в БД."""
+        user.refresh_from_db()
+        for field, value in counts.items():
+            self.assertEqual(getattr(user, field), value, field)
+
+    def test_post_count(self):
+        """Тестирование счетчика постов при создании, смене автора и удалении."""
+        Post.objects.create(author=self.author, title="Второй пост")
+        self.assertCounts(self.author, post_count=2)
+
+        self.post.author = self.other
+        self.post.save()
+        self.assertCounts(self.author, post_count=1)
+        self.assertCounts(self.other, post_count=1)
+
+        self.post.delete()
+        self.assertCounts(self.other, post_count=0)
+
+    def test_save_keeps_counters(self):
+        """Тестирование того, что сохранение модели не затирает счетчики."""
+        author = User.objects.get(pk=self.author.pk)
+        Post.objects.create(author=self.author, title="Второй пост")
+        author.first_name = "Иван"
+        author.save()
+        self.assertCounts(self.author, post_count=2, first_name="Иван")
+
+    def test_save_semantics_kept(self):
+        """Тестирование обычного поведения save() у моделей со счетчиками."""
+        partial = User.objects.only("first_name").get(pk=self.other.pk)
+        User.objects.filter(pk=self.other.pk).update(last_name="Петров")
+        partial.first_name = "Иван"
+        with self.assertNumQueries(1):
+            partial.save()
+        self.assertCounts(self.other, first_name="Иван", last_name="Петров")
+
+        post = Post.objects.get(pk=self.post.pk)
+        Post.objects.filter(pk=post.pk).update(view_count=5)
+        Post.objects.filter(pk=post.pk).delete()
+        post.view_count = 3
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.view_count, 3)
+
+    def test_subscription_count(self):
+        """Тестирование счетчика подписок пользователя."""
+        subscription = Subscription.objects.create(
+            user=self.other, type_of_sub="one_month"
+        )
+        subscription.is_paid = True
+        subscription.save()
+        self.assertCounts(self.other, subscription_count=1)
+
+        subscription.delete()
+        self.assertCounts(self.other, subscription_count=0)
+
+    def test_view_count(self):
+        """Тестирование учета просмотров, в том числе с ответом 304."""
+        url = reverse("post:post-detail", args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertContains(response, "Просмотров: 1")
+        self.client.get(url)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 2)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+
+    def test_recount(self):
+        """Тестирование исправления расхождений командой recount."""
+        User.objects.filter(pk=self.author.pk).update(post_count=7)
+        Subscription.objects.bulk_create(
+            [Subscription(user=self.other, type_of_sub="one_month")]
+        )
+        out = StringIO()
+        call_command("recount", batch_size=1, stdout=out)
+
+        self.assertIn("post_count: исправлено счетчиков: 1", out.getvalue())
+        self.assertIn("subscription_count: исправлено счетчиков: 1", out.getvalue())
+        self.assertCounts(self.author, post_count=1, subscription_count=0)
+        self.assertCounts(self.other, post_count=0, subscription_count=1)
+        self.assertEqual(CounterService.recount("post_count"), 0)
+
+
+class BenchmarkTests(TestCase):
+    """Тесты генератора данных и замера производительности страниц."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+
+    def test_seeder(self):
+        """Тестирование генерации данных вместе со счетчиками."""
+        Seeder(batch_size=7).run(users=20, posts=50, subscriptions=5)
+
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(User.objects.filter(is_author=True).count(), 2)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Subscription.objects.count(), 5)
+        self.assertEqual(CounterService.recount("post_count"), 0)
+        self.assertEqual(CounterService.recount("subscription_count"), 0)
+
+    def test_seeder_rerun_after_deletion(self):
+        """Тестирование повторного запуска после удаления пользователя набора."""
+        Seeder().run(users=5, posts=3, subscriptions=1)
+        User.objects.filter(phone="seed000000001").delete()
+
+        Seeder(seed=1).run(users=3, posts=2, subscriptions=1)
+
+        self.assertEqual(User.objects.filter(phone__startswith="seed").count(), 7)
+        self.assertTrue(User.objects.filter(phone="seed000000007").exists())
+
+    def test_seed_command(self):
+        """Тестирование команды seed: тарифы, состояния подписок и пароль."""
+        out = StringIO()
+        call_command(
+            "seed",
+            users=30,
+            posts=40,
+            subscriptions=27,
+            workers=1,
+            password="secret",
+            stdout=out,
+        )
+
+        self.assertIn("Посты: 40", out.getvalue())
+        self.assertEqual(
+            Subscription.objects.values("type_of_sub").distinct().count(),
+            len(Subscription.SUB_CHOICES),
+        )
+        self.assertEqual(
+            Subscription.objects.values("is_active", "is_paid").distinct().count(), 4
+        )
+        self.assertTrue(
+            Post.objects.filter(preview__startswith="post/preview/").exists()
+        )
+        self.assertTrue(User.objects.first().check_password("secret"))
+        self.assertEqual(CounterService.recount("post_count"), 0)
+
+    def test_run_and_compare(self):
+        """Тестирование замера всех страниц и поиска регрессий."""
+        Seeder().run(users=10, posts=30, subscriptions=2)
+        results = benchmark.run(requests=3, warmup=1)
+
+        self.assertEqual(
+            set(results["endpoints"]), {item.name for item in benchmark.ENDPOINTS}
+        )
+        self.assertEqual(results["meta"]["posts"], 30)
+        self.assertGreater(results["endpoints"]["index"]["queries"], 0)
+        self.assertEqual(results["endpoints"]["index-cached"]["queries"], 0)
+        detail = results["endpoints"]["post-detail"]
+        self.assertLessEqual(detail["p50_ms"], detail["p99_ms"])
+        self.assertLessEqual(detail["queries"], PostDetailView.query_budget)
+        self.assertEqual(benchmark.compare(results, results), [])
+
+        slower = json.loads(json.dumps(results))
+        slower["endpoints"]["post-detail"]["p95_ms"] = detail["p95_ms"] * 2
+        slower["endpoints"]["authors"]["queries"] += 1
+        self.assertEqual(
+            [(name, metric) for name, metric, *_ in benchmark.compare(results, slower)],
+            [("post-detail", "p95_ms"), ("authors", "queries")],
+        )
+
+
+class SeederWorkersTests(TransactionTestCase):
+    """Тесты генерации постов в нескольких процессах."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+
+    def test_parallel_posts(self):
+        """Тестирование вставки постов дочерними процессами со своими подключениями."""
+        counts = Seeder(batch_size=4, workers=2).run(
+            users=10, posts=21, subscriptions=3
+        )
+
+        self.assertEqual(counts, {"users": 10, "posts": 21, "subscriptions": 3})
+        self.assertEqual(Post.objects.count(), 21)
+        self.assertEqual(CounterService.recount("post_count"), 0)
+
+
+class MetricsTests(TestCase):
+    """Тесты метрик контроллеров."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        registry.reset()
+        self.author = User.objects.create(
+            phone="80291111111", email="author@test.com", is_author=True
+        )
+        Post.objects.create(author=self.author, title="Пост", is_free=True)
+        self.staff = User.objects.create(
+            phone="80292222222", email="staff@test.com", is_staff=True
+        )
+
+    def scrape(self, **headers):
+        """Запрашивает метрики от имени персонала."""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("metrics"), **headers)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_view_metrics(self):
+        """Тестирование учета запросов, SQL, шаблонов и размера ответа."""
+        self.client.force_login(self.author)
+        for _ in range(2):
+            response = self.client.get(reverse("post:post-list"))
+        self.client.get("/missing/")
+
+        data = registry.snapshot()["post:post-list"]
+        self.assertEqual(data["requests"], {"200": 2})
+        self.assertEqual(sum(data["buckets"]), 2)
+        self.assertGreater(data["queries"], 0)
+        self.assertGreater(data["query_seconds"], 0)
+        self.assertGreater(data["template_seconds"], 0)
+        self.assertEqual(data["response_bytes"], 2 * len(response.content))
+        self.assertEqual(registry.snapshot()["<unresolved>"]["requests"], {"404": 1})
+
+        text = self.scrape()
+        self.assertIn(
+            'django_view_requests_total{view="post:post-list",status="200"} 2', text
+        )
+        self.assertIn(
+            'django_view_request_duration_seconds_bucket{view="post:post-list",'
+            'le="+Inf"} 2',
+            text,
+        )
+        self.assertIn("# TYPE django_view_db_queries_total counter", text)
+
+    def test_response_cache_metrics(self):
+        """Тестирование попаданий и промахов кеша страниц в метриках."""
+        for _ in range(3):
+            self.client.get(reverse("post:index"))
+
+        text = self.scrape()
+        self.assertIn(
+            'django_view_response_cache_hits_total{view="post:index"} 2', text
+        )
+        self.assertIn(
+            'django_view_response_cache_misses_total{view="post:index"} 1', text
+        )
+
+    def test_access(self):
+        """Тестирование доступа к метрикам по токену и для персонала."""
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.scrape()
+        with override_settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self.client.logout()
+            response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+
+    def test_multiprocess_aggregation(self):
+        """Тестирование сложения метрик нескольких процессов."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(
+            os.path.join(directory, "metrics-1.json"), "w", encoding="utf-8"
+        ) as file:
+            worker = {"post:index": dict(_new_view(), requests={"200": 5})}
+            worker["post:index"]["buckets"][0] = 5
+            json.dump(worker, file)
+
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(reverse("post:index"))
+            text = self.scrape()
+
+        self.assertIn(
+            'django_view_requests_total{view="post:index",status="200"} 6', text
+        )
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(directory, f"metrics-{registry.process_id}.json")
+            )
+        )
+
+    def test_idle_worker_flushed(self):
+        """Тестирование сброса метрик фоновым потоком без новых запросов."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, f"metrics-{registry.process_id}.json")
+
+        with override_settings(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0.01):
+            self.client.get(reverse("post:index"))
+            deadline = time.monotonic() + 5
+            while not os.path.exists(path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        with open(path, encoding="utf-8") as file:
+            self.assertIn("post:index", json.load(file))
+        self.assertTrue(registry.process_id.startswith(f"{os.getpid()}-"))
+
+
+class SlowRequestTests(TestCase):
+    """Тесты сохранения медленных запросов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.author = User.objects.create(
+            phone="80291111111", email="author@test.com", is_author=True
+        )
+        for number in range(3):
+            Post.objects.create(author=self.author, title=f"Пост {number}")
+
+    def test_normalize(self):
+        """Тестирование шаблонов SQL: списки IN, литералы и пробелы."""
+        self.assertEqual(
+            SlowRequestService.normalize(
+                'SELECT "t0"."id" FROM t0\n WHERE id IN (%s, %s, %s) LIMIT 9'
+            ),
+            'SELECT "t0"."id" FROM t0 WHERE id IN (...) LIMIT ?',
+        )
+        self.assertEqual(
+            SlowRequestService.normalize("SELECT 1 WHERE name = 'it''s' AND x IN (%s)"),
+            "SELECT ? WHERE name = ? AND x IN (...)",
+        )
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001, SLOW_REQUEST_EXPLAIN=1)
+    def test_capture(self):
+        """Тестирование сохранения запроса с группировкой SQL и планом."""
+        self.client.force_login(self.author)
+        self.client.get(reverse("post:post-list"))
+
+        slow_request = SlowRequest.objects.get(view_name="post:post-list")
+        self.assertEqual(slow_request.status_code, 200)
+        self.assertEqual(slow_request.path, reverse("post:post-list"))
+        self.assertGreater(slow_request.query_count, 0)
+        self.assertEqual(
+            sum(group["count"] for group in slow_request.statements),
+            slow_request.query_count,
+        )
+        self.assertIn("plan", slow_request.statements[0])
+        self.assertNotIn("plan", slow_request.statements[-1])
+        self.assertFalse(
+            SlowRequest.objects.exclude(view_name="post:post-list").exists()
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.001)
+    def test_explain_select_only(self):
+        """Тестирование плана только для SELECT и сгруппированного N+1."""
+        statements = [
+            ("SELECT id FROM post_post WHERE id = %s", [post.pk], 0.002, "default")
+            for post in Post.objects.all()
+        ] + [("UPDATE post_post SET title = %s", ["x"], 0.001, "default")]
+        groups = SlowRequestService.group(statements)
+
+        self.assertEqual(groups[0][0]["count"], 3)
+        self.assertIn("post_post", SlowRequestService.explain(*groups[0][1]))
+        self.assertIsNone(SlowRequestService.explain(*groups[1][1]))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001)
+    def test_capture_rate_limited(self):
+        """Тестирование не более одного сохранения на контроллер за интервал."""
+        url = reverse("post:post-detail", args=[Post.objects.first().pk])
+        for _ in range(3):
+            self.client.get(url)
+        self.client.get(reverse("post:index"))
+
+        self.assertEqual(
+            SlowRequest.objects.filter(view_name="post:post-detail").count(), 1
+        )
+        self.assertEqual(SlowRequest.objects.filter(view_name="post:index").count(), 1)
+
+    @override_settings(
+        SLOW_REQUEST_THRESHOLD_MS=0.001,
+        SLOW_REQUEST_KEEP=2,
+        SLOW_REQUEST_CAPTURE_INTERVAL=0,
+    )
+    def test_rotation_and_admin(self):
+        """Тестирование удаления старых записей и просмотра в админке."""
+        for _ in range(3):
+            self.client.get(reverse("post:post-detail", args=[Post.objects.first().pk]))
+        self.assertEqual(SlowRequest.objects.count(), 2)
+
+        staff = User.objects.create(
+            phone="80292222222",
+            email="staff@test.com",
+            is_staff=True,
+            is_superuser=True,
+        )
+        self.client.force_login(staff)
+        slow_request = SlowRequest.objects.order_by("-id").first()
+        response = self.client.get(
+            reverse("admin:post_slowrequest_change", args=[slow_request.pk])
+        )
+        self.assertContains(response, "SQL-запросы по шаблонам")
+        self.assertContains(
+            self.client.get(reverse("admin:post_slowrequest_changelist")),
+            "post:post-detail",
+        )
+
+
+class ProfilerTests(TestCase):
+    """Тесты профилирования запросов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.profiles_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiles_dir)
+        settings_override = override_settings(
+            PROFILES_DIR=self.profiles_dir, PROFILER_RELOAD_INTERVAL=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(SampleRate.clear)
+        self.staff = User.objects.create(
+            phone="80292222222", email="staff@test.com", is_staff=True
+        )
+
+    def profiles(self):
+        """Имена сохраненных профилей."""
+        return [
+            name
+            for name in os.listdir(self.profiles_dir)
+            if name.endswith(".collapsed")
+        ]
+
+    def test_sampler(self):
+        """Тестирование сбора стеков потока в формате collapsed stacks."""
+
+        def busy_loop():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        worker = threading.Thread(target=busy_loop)
+        worker.start()
+        sampler = Sampler(worker.ident, interval=0.001)
+        sampler.start()
+        worker.join()
+        stacks = sampler.stop()
+
+        self.assertTrue(stacks)
+        self.assertTrue(
+            any(stack.endswith("busy_loop") for stack in stacks), list(stacks)
+        )
+
+    def test_requested_by_staff(self):
+        """Тестирование профилирования по заголовку только для персонала."""
+        url = reverse("post:post-list")
+        response = self.client.get(url, HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profile-File", response)
+        self.assertEqual(self.profiles(), [])
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {"profile": "1"})
+        self.assertIn("post_post-list", response["X-Profile-File"])
+        self.assertEqual(self.profiles(), [response["X-Profile-File"]])
+
+    @override_settings(PROFILER_KEEP=2)
+    def test_old_profiles_removed(self):
+        """Тестирование хранения только PROFILER_KEEP последних профилей."""
+        for name in ("20200101-000000-old.collapsed", "20200101-000001-old.collapsed"):
+            with open(os.path.join(self.profiles_dir, name), "w") as file:
+                file.write("main 1\n")
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("post:index"), HTTP_X_PROFILE="1")
+
+        self.assertEqual(
+            sorted(self.profiles()),
+            ["20200101-000001-old.collapsed", response["X-Profile-File"]],
+        )
+
+    def test_sample_rate_command(self):
+        """Тестирование случайного профилирования с долей из команды profiling."""
+        url = reverse("post:index")
+        self.client.get(url)
+        self.assertEqual(self.profiles(), [])
+
+        out = StringIO()
+        call_command("profiling", rate=1, stdout=out)
+        self.assertIn("Доля профилируемых запросов: 1", out.getvalue())
+        response = self.client.get(url)
+        self.assertNotIn("X-Profile-File", response)
+        self.assertEqual(len(self.profiles()), 1)
+
+        call_command("profiling", reset=True, stdout=out)
+        self.client.get(url)
+        self.assertEqual(len(self.profiles()), 1)
+
+
+class ThumbnailTests(TemporaryMediaMixin, TestCase):
+    """Тесты создания уменьшенных копий превью."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        super().setUp()
+        self.user = User.objects.create(phone=80297777777, email="test@tesov.com")
+
+    def test_thumbnails_created_on_upload(self):
+        """Тестирование создания превью всех размеров при загрузке."""
+        post = Post.objects.create(
+            author=self.user, title="Title", preview=make_image()
+        )
+        for size in (140, 280):
+            for extension, image_format in (("webp", "WEBP"), ("jpg", "JPEG")):
+                name = thumbnail_name(post.preview.name, size, extension)
+                with default_storage.open(name) as file:
+                    image = Image.open(file)
+                    self.assertEqual(image.size, (size, size))
+                    self.assertEqual(image.format, image_format)
+
+    def test_png_fallback(self):
+        """Тестирование запасного формата PNG для PNG-оригинала."""
+        post = Post.objects.create(
+            author=self.user,
+            title="Title",
+            preview=make_image("preview.png", image_format="PNG"),
+        )
+        self.assertTrue(
+            default_storage.exists(thumbnail_name(post.preview.name, 140, "png"))
+        )
+        self.assertTrue(
+            default_storage.exists(thumbnail_name(post.preview.name, 140, "webp"))
+        )
+
+    def test_thumbnails_keep_source_extension(self):
+        """Тестирование раздельных превью для cat.jpg и cat.png."""
+        jpeg = Post.objects.create(
+            author=self.user, title="Jpeg", preview=make_image("cat.jpg")
+        )
+        png = Post.objects.create(
+            author=self.user,
+            title="Png",
+            preview=make_image("cat.png", size=(300, 300), image_format="PNG"),
+        )
+        jpeg_thumbnail = thumbnail_name(jpeg.preview.name, 140, "webp")
+        png_thumbnail = thumbnail_name(png.preview.name, 140, "webp")
+
+        self.assertNotEqual(jpeg_thumbnail, png_thumbnail)
+        self.assertTrue(default_storage.exists(jpeg_thumbnail))
+        self.assertTrue(default_storage.exists(png_thumbnail))
+
+    def test_upload_keeps_original_named_like_thumbnail(self):
+        """Тестирование того, что создание превью не удаляет чужие оригиналы."""
+        original = default_storage.save("post/preview/x_140.jpg", make_image())
+        Post.objects.create(author=self.user, title="X", preview=make_image("x.jpg"))
+
+        self.assertEqual(original, "post/preview/x_140.jpg")
+        self.assertTrue(default_storage.exists(original))
+
+    def test_media_filter_size(self):
+        """Тестирование выбора превью фильтром media_filter."""
+        template = Template(
+            "{% load my_tags %}{{ path|media_filter }} {{ path|media_filter:'140' }} "
+            "{{ path|media_filter:'280.webp' }} {{ empty|media_filter:'140' }}"
+        )
+        rendered = template.render(Context({"path": "post/preview/gase.jpg"}))
+
+        self.assertEqual(
+            rendered,
+            "/media/post/preview/gase.jpg "
+            "/media/post/preview/thumbnails/gase.jpg_140.jpg "
+            "/media/post/preview/thumbnails/gase.jpg_280.webp #",
+        )
+
+    def test_generate_thumbnails_command(self):
+        """Тестирование создания превью для ранее загруженных файлов."""
+        name = default_storage.save("post/preview/old.jpg", make_image())
+        post = Post.objects.create(author=self.user, title="Title")
+        Post.objects.filter(pk=post.pk).update(preview=name)
+        out = StringIO()
+
+        call_command("generate_thumbnails", stdout=out)
+        call_command("generate_thumbnails", stdout=out)
+
+        self.assertIn("Создано превью: 1", out.getvalue())
+        self.assertIn("Создано превью: 0", out.getvalue())
+        self.assertTrue(
+            default_storage.exists("post/preview/thumbnails/old.jpg_280.webp")
+        )
+
+
+class ProtectedMediaTests(TemporaryMediaMixin, TestCase):
+    """Тесты выдачи медиафайлов с проверкой доступа."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        super().setUp()
+        cache.clear()
+        self.author = User.objects.create(phone=80297777777, email="test@tesov.com")
+        self.reader = User.objects.create(phone=80291111111, email="other@tesov.com")
+        self.paid_post = Post.objects.create(
+            author=self.author, title="Paid", preview=make_image("paid.jpg")
+        )
+        self.free_post = Post.objects.create(
+            author=self.author,
+            title="Free",
+            is_free=True,
+            preview=make_image("free.jpg"),
+        )
+        self.paid_url = f"/media/{self.paid_post.preview.name}"
+
+    def test_free_preview_public(self):
+        """Тестирование доступа к превью бесплатного поста без авторизации."""
+        response = self.client.get(f"/media/{self.free_post.preview.name}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("public", response["Cache-Control"])
+        with default_storage.open(self.free_post.preview.name) as file:
+            self.assertEqual(b"".join(response.streaming_content), file.read())
+
+    def test_paid_preview_access(self):
+        """Тестирование доступа к превью платного поста."""
+        thumbnail_url = "/media/" + thumbnail_name(
+            self.paid_post.preview.name, 140, "webp"
+        )
+        self.assertEqual(self.client.get(self.paid_url).status_code, 403)
+        self.assertEqual(self.client.get(thumbnail_url).status_code, 403)
+
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(self.paid_url).status_code, 403)
+
+        Subscription.objects.create(
+            user=self.reader, type_of_sub="one_month", is_paid=True
+        )
+        response = self.client.get(thumbnail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(self.paid_url).status_code, 200)
+
+    def test_thumbnail_checked_against_its_original(self):
+        """Тестирование доступа к превью по его единственному оригиналу."""
+        paid = Post.objects.create(
+            author=self.author, title="Paid cat", preview=make_image("cat.jpg")
+        )
+        Post.objects.create(
+            author=self.author,
+            title="Free cat",
+            is_free=True,
+            preview=make_image("cat.png", image_format="PNG"),
+        )
+
+        for size in (140, 280):
+            for extension in ("webp", "jpg"):
+                url = "/media/" + thumbnail_name(paid.preview.name, size, extension)
+                self.assertEqual(self.client.get(url).status_code, 403)
+
+    @override_settings(MEDIA_ACCEL_BACKEND="nginx")
+    def test_x_accel_redirect(self):
+        """Тестирование передачи отдачи файла nginx."""
+        self.client.force_login(self.author)
+        response = self.client.get(self.paid_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            f"/protected-media/{self.paid_post.preview.name}",
+        )
+        self.assertEqual(response.content, b"")
+
+    @override_settings(MEDIA_ACCEL_BACKEND="sendfile")
+    def test_x_sendfile(self):
+        """Тестирование передачи отдачи файла через X-Sendfile."""
+        self.client.force_login(self.author)
+        response = self.client.get(self.paid_url)
+
+        self.assertEqual(response["X-Sendfile"], self.paid_post.preview.path)
+
+    def test_range_request(self):
+        """Тестирование выдачи диапазона байт."""
+        self.client.force_login(self.author)
+        with default_storage.open(self.paid_post.preview.name) as file:
+            content = file.read()
+
+        response = self.client.get(self.paid_url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(content)}")
+        self.assertEqual(b"".join(response.streaming_content), content[10:20])
+
+        response = self.client.get(self.paid_url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(b"".join(response.streaming_content), content[-5:])
+
+        response = self.client.get(self.paid_url, HTTP_RANGE=f"bytes={len(content)}-")
+        self.assertEqual(response.status_code, 416)
+
+    def test_conditional_request(self):
+        """Тестирование ответа 304 для неизмененного файла."""
+        self.client.force_login(self.author)
+        response = self.client.get(self.paid_url)
+        etag = response["ETag"]
+        b"".join(response.streaming_content)
+
+        response = self.client.get(self.paid_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_path_traversal(self):
+        """Тестирование запрета выхода за пределы MEDIA_ROOT."""
+        response = self.client.get("/media/../config/settings.py")
+
+        self.assertEqual(response.status_code, 404)
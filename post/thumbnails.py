@@ -0,0 +1,104 @@
+import os
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Стороны квадратных превью: 140 для обычных экранов и 280 для retina
+THUMBNAIL_SIZES = (140, 280)
+
+# Расширение файла -> формат Pillow и параметры сохранения
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+    "png": ("PNG", {"optimize": True}),
+}
+
+# Каталог превью внутри каталога оригиналов. Загружаемые файлы в него не
+# попадают: имя загрузки не может содержать "/"
+THUMBNAIL_DIR = "thumbnails"
+
+THUMBNAIL_RE = re.compile(
+    r"^(?P<directory>(?:.+/)?)%s/(?P<source>[^/]+)_(?:%s)\.(?:%s)$"
+    % (
+        THUMBNAIL_DIR,
+        "|".join(map(str, THUMBNAIL_SIZES)),
+        "|".join(THUMBNAIL_FORMATS),
+    )
+)
+
+
+def fallback_extension(name):
+    """Формат запасного превью: PNG для PNG-оригиналов (прозрачность), иначе JPEG."""
+    return "png" if name.lower().endswith(".png") else "jpg"
+
+
+def thumbnail_name(name, size, extension=None):
+    """
+    Имя превью, например post/preview/thumbnails/gase.jpg_140.webp.
+
+    Имя оригинала сохраняется целиком, поэтому превью gase.jpg и gase.png
+    не совпадают, а по имени превью однозначно восстанавливается оригинал.
+    """
+    directory, filename = os.path.split(name)
+    return os.path.join(
+        directory,
+        THUMBNAIL_DIR,
+        f"{filename}_{size}.{extension or fallback_extension(name)}",
+    )
+
+
+def thumbnail_source(name):
+    """Для имени превью возвращает имя оригинала, иначе None."""
+    match = THUMBNAIL_RE.match(name)
+    return match.group("directory") + match.group("source") if match else None
+
+
+def thumbnail_names(name):
+    """Все имена превью для оригинала."""
+    return [
+        thumbnail_name(name, size, extension)
+        for size in THUMBNAIL_SIZES
+        for extension in ("webp", fallback_extension(name))
+    ]
+
+
+def has_thumbnails(name, storage=default_storage):
+    """Проверяет, созданы ли превью для оригинала."""
+    return all(storage.exists(thumbnail) for thumbnail in thumbnail_names(name))
+
+
+def generate_thumbnails(name, storage=default_storage):
+    """Создает превью всех размеров в WebP и запасном формате в каталоге превью."""
+    with storage.open(name) as source:
+        image = Image.open(source)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+
+    for size in THUMBNAIL_SIZES:
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for extension in ("webp", fallback_extension(name)):
+            image_format, params = THUMBNAIL_FORMATS[extension]
+            converted = thumbnail
+            if image_format == "JPEG" and thumbnail.mode != "RGB":
+                converted = thumbnail.convert("RGB")
+            buffer = BytesIO()
+            converted.save(buffer, format=image_format, **params)
+
+            target = thumbnail_name(name, size, extension)
+            # Удаляется только прежнее превью этого же оригинала
+            if thumbnail_source(target) == name and storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def ensure_thumbnails(field_file, force=False):
+    """Создает превью для файла из ImageField, если их еще нет. Возвращает True при создании."""
+    if not field_file:
+        return False
+    if not force and has_thumbnails(field_file.name, field_file.storage):
+        return False
+    generate_thumbnails(field_file.name, field_file.storage)
+    return True
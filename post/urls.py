@@ -2,14 +2,24 @@ from django.urls import path
 
 from post.apps import PostConfig
 from post.views import (ChooseSubView, IndexView, PaymentView, PostCreateView,
-                        PostDeleteView, PostDetailView, PostListView,
-                        PostUpdateView, SubConfirmSuccessView)
+                        PostDeleteView, PostDetailAPIView, PostDetailView,
+                        PostListAPIView, PostListView, PostSearchAPIView,
+                        PostSearchView, PostUpdateView, StripeWebhookView,
+                        SubConfirmSuccessView)
 
 app_name = PostConfig.name
 
 urlpatterns = [
     path("", IndexView.as_view(), name="index"),
     path("post/", PostListView.as_view(), name="post-list"),
+    path("post/search/", PostSearchView.as_view(), name="post-search"),
+    path("post/api/search/", PostSearchAPIView.as_view(), name="api-post-search"),
+    path("post/api/posts/", PostListAPIView.as_view(), name="api-post-list"),
+    path(
+        "post/api/posts/<int:pk>/",
+        PostDetailAPIView.as_view(),
+        name="api-post-detail",
+    ),
     path("post/<int:pk>/", PostDetailView.as_view(), name="post-detail"),
     path("post/create/", PostCreateView.as_view(), name="post-create"),
     path("post/update/<int:pk>/", PostUpdateView.as_view(), name="post-update"),
@@ -21,4 +31,5 @@ urlpatterns = [
         name="subscription-payment",
     ),
     path("subscription/success/", SubConfirmSuccessView.as_view(), name="sub-success"),
+    path("subscription/webhook/", StripeWebhookView.as_view(), name="stripe-webhook"),
 ]
@@ -1,26 +1,149 @@
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, redirect, render
+import os
+import posixpath
+from functools import partial
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Max
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.middleware.csrf import get_token
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.template.response import SimpleTemplateResponse
 from django.urls import reverse_lazy
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import (CreateView, DeleteView, DetailView, ListView,
                                   UpdateView)
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
 
+from post.conditional import conditional_response, make_etag
 from post.forms import PostForm, PostUpdateForm
-from post.models import Post, Subscription
-from post.services import (SubscriptionService, create_stripe_session,
-                           get_stripe_price)
-from users.permissions import CustomLoginRequiredMixin
+from post.media import media_response
+from post.metrics import registry
+from post.models import NOT_FREE, Post, Subscription
+from post.paginators import (KeysetPaginationMixin, PostCursorPagination,
+                             SearchPagination)
+from post.serializers import PostSearchSerializer, PostSerializer
+from post.services import (CounterService, EntitlementService,
+                           MediaAccessService, PostAccessService,
+                           PostCardCache, PostSearchService, PriceCatalog,
+                           ResponseCache, StripeEventService,
+                           SubscriptionService, acreate_stripe_session)
+from users.permissions import AsyncLoginRequiredMixin, CustomLoginRequiredMixin
+
+# Поля поста, которые выводятся в карточках на главной и в списке постов.
+POST_CARD_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "preview",
+    "is_free",
+    "author_id",
+    "updated_at",
+)
+
+
+class AnonymousCacheMixin:
+    """Отдает анонимным посетителям готовую страницу списка постов из кеша."""
+
+    def get(self, request, *args, **kwargs):
+        """Берет ответ из кеша или сохраняет в него только что отрисованный."""
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        response = ResponseCache.get(request)
+        if response is not None:
+            return response
+
+        # Снимок до выборки: сброс тегов во время отрисовки не даст сохранить
+        # устаревшую страницу
+        sequence = ResponseCache.sequence()
+        response = super().get(request, *args, **kwargs)
+        if isinstance(response, SimpleTemplateResponse):
+            response.add_post_render_callback(
+                lambda rendered: ResponseCache.set(
+                    request,
+                    rendered,
+                    ResponseCache.post_tags(rendered.context_data["object_list"]),
+                    sequence,
+                )
+            )
+        return response
+
+
+class ConditionalGetMixin:
+    """Условные запросы: страница, не изменившаяся с прошлого визита, отдается как 304."""
+
+    def get_viewer_key(self):
+        """
+        Все, что кроме постов влияет на страницу: пользователь, его подписка
+        и CSRF-токен формы выхода, который меняется при каждом входе.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return ("anonymous",)
+        # Создает секрет CSRF при первом визите, как это сделал бы шаблон
+        get_token(self.request)
+        return (
+            user.pk,
+            user.is_author,
+            EntitlementService.get_status(user)["is_paid"],
+            self.request.META.get("CSRF_COOKIE"),
+        )
+
+    def conditional_response(self, etag_parts, last_modified, build_response):
+        """Ответ 304 или ответ от build_response, с валидаторами в обоих случаях."""
+        etag = make_etag(
+            self.request.get_full_path(), *etag_parts, *self.get_viewer_key()
+        )
+        response = conditional_response(
+            self.request, etag, last_modified, build_response
+        )
+        # Браузер перепроверяет страницу при каждом визите и получает 304
+        if self.request.user.is_authenticated:
+            patch_cache_control(response, no_cache=True, private=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
+
+
+class ConditionalListMixin(ConditionalGetMixin):
+    """Условные запросы для списков постов по max(updated_at)."""
+
+    def get(self, request, *args, **kwargs):
+        """Сверяет валидатор списка до выборки постов и отрисовки страницы."""
+        last_modified = Post.objects.aggregate(last_modified=Max("updated_at"))[
+            "last_modified"
+        ]
+        # Удаление поста не меняет max(updated_at), его отмечает версия тега
+        posts_version = ResponseCache.tag_version(ResponseCache.POSTS_TAG)
+        return self.conditional_response(
+            (last_modified and last_modified.timestamp(), posts_version),
+            last_modified,
+            partial(super().get, request, *args, **kwargs),
+        )
 
 
-class IndexView(ListView):
+class IndexView(AnonymousCacheMixin, ConditionalListMixin, ListView):
     """Контроллер для отображения главной страницы с последними постами."""
 
     model = Post
     template_name = "post/base.html"
+    # Сессия, пользователь, статус подписки, валидатор списка и сами посты.
+    query_budget = 5
 
     def get_queryset(self):
         """Получает последние 3 поста, отсортированные по убыванию id."""
-        return Post.objects.all().order_by("-id")[:3]  # или исп
+        return Post.objects.only(*POST_CARD_FIELDS).order_by("-id")[:3]
 
 
 class PostCreateView(CustomLoginRequiredMixin, CreateView):
@@ -44,20 +167,186 @@ class PostUpdateView(CustomLoginRequiredMixin, UpdateView):
     success_url = reverse_lazy("post:post-list")
 
 
-class PostListView(ListView):
-    """Контроллер для отображения списка всех постов."""
+class PostListView(
+    AnonymousCacheMixin, ConditionalListMixin, KeysetPaginationMixin, ListView
+):
+    """Контроллер для отображения списка всех постов с курсорной пагинацией."""
 
     model = Post
+    ordering = ("not_free", "title", "id")
+    paginate_by = 9
+    # Сессия, пользователь, статус подписки, валидатор списка и страница постов.
+    query_budget = 5
+
+    def get_queryset(self):
+        """Получает все посты: сначала бесплатные, затем по названию."""
+        return (
+            Post.objects.only(*POST_CARD_FIELDS)
+            .annotate(not_free=NOT_FREE)
+            .order_by(*self.ordering)
+        )
+
+    def get_context_data(self, **kwargs):
+        """Добавляет карточки постов страницы, взятые из кеша одним запросом."""
+        context = super().get_context_data(**kwargs)
+        context["post_cards"] = PostCardCache.render_many(
+            context["object_list"], self.request.user
+        )
+        return context
+
+
+class PostSearchView(ListView):
+    """Контроллер полнотекстового поиска по постам."""
+
+    template_name = "post/post_search.html"
+    paginate_by = 9
+    search_kwarg = "q"
+    # Сессия, пользователь, статус подписки, число результатов и страница.
+    query_budget = 5
+
+    def get_queryset(self):
+        """Ищет посты по запросу из параметра q с учетом доступа к платным."""
+        text = self.request.GET.get(self.search_kwarg, "").strip()
+        if not text:
+            return Post.objects.none()
+        return PostSearchService.search(text, self.request.user)
+
+    def get_context_data(self, **kwargs):
+        """Добавляет в контекст текст запроса."""
+        context = super().get_context_data(**kwargs)
+        context["query"] = self.request.GET.get(self.search_kwarg, "").strip()
+        return context
+
+
+class PostSearchAPIView(ListAPIView):
+    """API полнотекстового поиска по постам."""
+
+    serializer_class = PostSearchSerializer
+    pagination_class = SearchPagination
+    permission_classes = (AllowAny,)
+
+    def get_queryset(self):
+        """Ищет посты по запросу из параметра q с учетом доступа к платным."""
+        text = self.request.query_params.get("q", "").strip()
+        if not text:
+            return Post.objects.none()
+        return PostSearchService.search(text, self.request.user)
+
+
+class PostAPIMixin:
+    """Общее для API постов: правила доступа, выбор полей и условные запросы."""
+
+    serializer_class = PostSerializer
+    permission_classes = (AllowAny,)
+    fields_kwarg = "fields"
+
+    def get_fields(self):
+        """Поля из параметра fields через запятую или None, если выводятся все."""
+        fields = [
+            name.strip()
+            for name in self.request.query_params.get(self.fields_kwarg, "").split(",")
+            if name.strip()
+        ]
+        unknown = set(fields) - set(PostSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError(
+                {self.fields_kwarg: f"Неизвестные поля: {', '.join(sorted(unknown))}."}
+            )
+        return fields or None
 
     def get_queryset(self):
-        """Получает все посты, отсортированные в обратном порядке по is_free и названию."""
-        return Post.objects.all().order_by("-is_free", "title")
+        """Доступные пользователю посты, из БД читаются только выводимые поля."""
+        fields = self.get_fields() or PostSerializer.Meta.fields
+        return PostAccessService.visible_posts(self.request.user).only(
+            "id", "updated_at", *fields
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        """Передает сериализатору выбранные поля."""
+        kwargs["fields"] = self.get_fields()
+        return super().get_serializer(*args, **kwargs)
+
+    def conditional_response(self, posts, build_response):
+        """Ответ 304, если посты не менялись, иначе ответ от build_response."""
+        etag = make_etag(
+            self.get_fields(),
+            *((post.pk, post.updated_at.timestamp()) for post in posts),
+        )
+        last_modified = max((post.updated_at for post in posts), default=None)
+        response = conditional_response(
+            self.request, etag, last_modified, build_response
+        )
+        # Набор доступных постов зависит от пользователя
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+
+class PostListAPIView(PostAPIMixin, ListAPIView):
+    """API списка постов с курсорной пагинацией."""
 
+    pagination_class = PostCursorPagination
 
-class PostDetailView(DetailView):
+    def list(self, request, *args, **kwargs):
+        """Отдает страницу постов или 304, если она не изменилась."""
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.conditional_response(
+            page,
+            lambda: self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            ),
+        )
+
+
+class PostDetailAPIView(PostAPIMixin, RetrieveAPIView):
+    """API поста."""
+
+    def retrieve(self, request, *args, **kwargs):
+        """Отдает пост или 304, если он не изменился."""
+        post = self.get_object()
+        return self.conditional_response(
+            [post], lambda: Response(self.get_serializer(post).data)
+        )
+
+
+class PostDetailView(ConditionalGetMixin, DetailView):
     """Контроллер для отображения деталей конкретного поста."""
 
     model = Post
+    # Сессия, пользователь, статус подписки, пост вместе с автором и учет просмотра.
+    query_budget = 5
+
+    def get_queryset(self):
+        """Загружает пост вместе с именем автора одним запросом."""
+        return Post.objects.select_related("author").only(
+            "id",
+            "title",
+            "description",
+            "updated_at",
+            "view_count",
+            "author__first_name",
+            "author__last_name",
+        )
+
+    def get(self, request, *args, **kwargs):
+        """Отдает 304, если пост и имя автора не менялись, не отрисовывая страницу."""
+        self.object = self.get_object()
+        # Браузер перепроверяет страницу при каждом визите, поэтому просмотр
+        # учитывается и для ответа 304. updated_at при этом не меняется
+        CounterService.record_view(self.object.pk)
+        self.object.view_count += 1
+        return self.conditional_response(
+            (
+                self.object.updated_at.timestamp(),
+                self.object.author.first_name,
+                self.object.author.last_name,
+            ),
+            self.object.updated_at,
+            self.render_post,
+        )
+
+    def render_post(self):
+        """Отрисовывает страницу поста."""
+        return self.render_to_response(self.get_context_data(object=self.object))
 
 
 class PostDeleteView(CustomLoginRequiredMixin, DeleteView):
@@ -67,60 +356,66 @@ class PostDeleteView(CustomLoginRequiredMixin, DeleteView):
     success_url = reverse_lazy("post:post-list")
 
 
-class ChooseSubView(CustomLoginRequiredMixin, View):
+class ChooseSubView(AsyncLoginRequiredMixin, View):
     """Контроллер для выбора типа подписки."""
 
     template_name = "post/choose_sub.html"
 
-    def get(self, request):
+    async def get(self, request):
         """Обрабатывает GET-запрос и отображает страницу выбора подписки. Подписки из модели."""
         context = {"subscription_choices": Subscription.SUB_CHOICES}
-        return render(request, self.template_name, context)
+        return await sync_to_async(render)(request, self.template_name, context)
 
-    def post(self, request):
+    async def post(self, request):
         """Обрабатывает POST-запрос для создания подписки."""
         # Получаем тип подписки из формы
         type_of_sub = request.POST.get("type_of_sub")
-        if SubscriptionService.has_active_subscription(request.user):
+        if await SubscriptionService.ahas_active_subscription(request.user):
             return HttpResponse(
                 "У вас уже есть активная подписка. Вы не можете купить новую.",
                 status=400,
             )
 
-        request.session["type_of_sub"] = type_of_sub
-        subscription = SubscriptionService.create_or_update_subscription(
+        await request.session.aset("type_of_sub", type_of_sub)
+        subscription = await SubscriptionService.acreate_or_update_subscription(
             request.user, type_of_sub
         )
 
         return redirect("post:subscription-payment", subscription_id=subscription.id)
 
 
-class PaymentView(CustomLoginRequiredMixin, View):
+class PaymentView(AsyncLoginRequiredMixin, View):
     """Контроллер для обработки платежа по подписке."""
 
     template_name = "post/payment.html"
 
-    def get(self, request, subscription_id):
+    async def get(self, request, subscription_id):
         """Обрабатывает GET-запрос для отображения страницы оплаты."""
-        subscription = get_object_or_404(
+        subscription = await aget_object_or_404(
             Subscription, id=subscription_id, user=request.user
         )
+        # Оплаченную подписку повторно не оплачивают
+        if subscription.is_paid:
+            return redirect("post:sub-success")
 
         price_in_usd = subscription.get_price()
 
-        interval = SubscriptionService.get_subscription_interval(
-            subscription.type_of_sub
-        )
-
-        price = get_stripe_price(price_in_usd, int(interval))
-        session_id, payment_link = create_stripe_session(price)
-        subscription.session_id = session_id
-        subscription.link = payment_link
-        subscription.is_paid = True
-        subscription.save()
+        # Открытую сессию оплаты переиспользуем, в Stripe идем только за новой.
+        # Запросы к Stripe выполняются асинхронно и не занимают поток воркера.
+        if not SubscriptionService.has_open_session(subscription):
+            price_id = await PriceCatalog.aget_subscription_price_id(subscription)
+            session_id, payment_link, expires_at = await acreate_stripe_session(
+                price_id
+            )
+            subscription.session_id = session_id
+            subscription.link = payment_link
+            subscription.session_expires_at = expires_at
+            # Оплата подтверждается только вебхуком Stripe
+            await subscription.asave()
+        payment_link = subscription.link
 
         # Возвращаем ответ, рендерим шаблон с данными
-        return render(
+        return await sync_to_async(render)(
             request,
             self.template_name,
             {
@@ -139,3 +434,65 @@ class SubConfirmSuccessView(CustomLoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         """Обрабатывает GET-запрос и отображает страницу успешного подтверждения подписки."""
         return render(request, self.template_name)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class StripeWebhookView(View):
+    """Контроллер приема вебхуков Stripe."""
+
+    def post(self, request):
+        """Проверяет подпись и сохраняет событие во входящую очередь."""
+        try:
+            event = StripeEventService.parse_event(
+                request.body, request.headers.get("Stripe-Signature", "")
+            )
+        except (ValueError, stripe.SignatureVerificationError):
+            return HttpResponse(status=400)
+
+        # Событие применяется к подпискам отдельным обработчиком пачками
+        StripeEventService.record(event)
+        return HttpResponse(status=200)
+
+
+class ProtectedMediaView(View):
+    """Контроллер выдачи медиафайлов с проверкой доступа к платному контенту."""
+
+    def get(self, request, path):
+        """Проверяет доступ и передает отдачу файла веб-серверу."""
+        name = posixpath.normpath(path).lstrip("/")
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, name)
+        except SuspiciousFileOperation:
+            raise Http404("Файл не найден.")
+        if not os.path.isfile(full_path):
+            raise Http404("Файл не найден.")
+
+        access = MediaAccessService.get_access(request.user, name)
+        if access is None:
+            return HttpResponseForbidden("Нет доступа к файлу.")
+
+        # Превью платных постов не должны оседать в общих кешах
+        if access == MediaAccessService.PUBLIC:
+            cache_control = "public, max-age=86400"
+        else:
+            cache_control = "private, max-age=3600"
+        return media_response(request, name, full_path, cache_control)
+
+
+class MetricsView(View):
+    """Метрики контроллеров в текстовом формате Prometheus."""
+
+    def get(self, request):
+        """Отдает метрики по токену METRICS_TOKEN, без него - только персоналу."""
+        if settings.METRICS_TOKEN:
+            allowed = constant_time_compare(
+                request.headers.get("Authorization", ""),
+                f"Bearer {settings.METRICS_TOKEN}",
+            )
+        else:
+            allowed = request.user.is_staff
+        if not allowed:
+            return HttpResponseForbidden("Нет доступа к метрикам.")
+        return HttpResponse(
+            registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
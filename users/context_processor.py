@@ -1,13 +1,15 @@
-from post.models import Subscription
+from django.utils.functional import SimpleLazyObject
+
+from post.services import EntitlementService
 
 
 def sub_status(request):
     """Добавляем статус подписки на все шаблоны."""
     if request.user.is_authenticated:
-        # Получаем последнюю активную подписку пользователя
-        subscription = Subscription.objects.filter(
-            user=request.user, is_active=True
-        ).last()
+        # Статус берется из кеша и только если шаблон к нему обращается
+        subscription = SimpleLazyObject(
+            lambda: EntitlementService.get_status(request.user)
+        )
         return {"subscription": subscription}
 
     return {}
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0005_alter_user_token"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_author", True)),
+                fields=["last_name", "id"],
+                name="user_author_last_name_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_user_author_last_name_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="post_count",
+            field=models.PositiveIntegerField(
+                db_default=0, default=0, editable=False, verbose_name="Число постов"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="subscription_count",
+            field=models.PositiveIntegerField(
+                db_default=0, default=0, editable=False, verbose_name="Число подписок"
+            ),
+        ),
+    ]
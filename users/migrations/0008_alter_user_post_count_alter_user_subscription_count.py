@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:18
+
+from django.db import migrations
+
+import common.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_user_post_count_user_subscription_count"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="post_count",
+            field=common.fields.CounterField(
+                db_default=0, default=0, editable=False, verbose_name="Число постов"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="subscription_count",
+            field=common.fields.CounterField(
+                db_default=0, default=0, editable=False, verbose_name="Число подписок"
+            ),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from common.fields import CounterField
+
 
 class User(AbstractUser):
     username = None
@@ -17,6 +19,13 @@ class User(AbstractUser):
     phone = models.CharField(max_length=35, unique=True, verbose_name="Телефон")
     token = models.CharField(max_length=6, verbose_name="Токен", blank=True, null=True)
     is_author = models.BooleanField(default=False, verbose_name="Является автором?")
+    # Счетчики обновляются сигналами постов и подписок, сверка - команда recount
+    post_count = CounterField(
+        default=0, db_default=0, editable=False, verbose_name="Число постов"
+    )
+    subscription_count = CounterField(
+        default=0, db_default=0, editable=False, verbose_name="Число подписок"
+    )
 
     USERNAME_FIELD = "phone"
     REQUIRED_FIELDS = []
@@ -24,3 +33,11 @@ class User(AbstractUser):
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+        indexes = [
+            # Каталог авторов: только авторы, в порядке фамилий
+            models.Index(
+                fields=["last_name", "id"],
+                name="user_author_last_name_idx",
+                condition=models.Q(is_author=True),
+            ),
+        ]
@@ -14,3 +14,14 @@ class CustomLoginRequiredMixin(LoginRequiredMixin):
             "Пожалуйста, войдите в систему, чтобы получить доступ к этой странице.",
         )
         return redirect(reverse("users:login"))
+
+
+class AsyncLoginRequiredMixin(CustomLoginRequiredMixin):
+    """Миксин для проверки авторизации пользователя в асинхронных контроллерах."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Получает пользователя асинхронно и передает запрос обработчику."""
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
@@ -1,8 +1,14 @@
 import random
 
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from twilio.rest import Client
 
-from config.settings import ACCOUNT_SID, AUTH_TOKEN
+from config.settings import (ACCOUNT_SID, AUTH_TOKEN,
+                             AUTHOR_HEADER_CACHE_TIMEOUT)
+from post.models import Post
 from users.models import User
 
 
@@ -25,3 +31,50 @@ def send_sms_for_your_number(token, phone):
         to=f"+{phone}",
     )
     print(message.sid)
+
+
+def authors_with_post_stats():
+    """
+    Авторы с числом постов и датой последнего поста.
+
+    Число постов берется из счетчика, последний пост - подзапросом по индексу
+    (author, -created_at): он выполняется только для попавших в выборку строк.
+    """
+    return (
+        User.objects.filter(is_author=True)
+        .only("id", "first_name", "last_name", "avatar", "post_count")
+        .annotate(
+            latest_post_at=Subquery(
+                Post.objects.filter(author=OuterRef("pk"))
+                .order_by("-created_at")
+                .values("created_at")[:1]
+            ),
+        )
+    )
+
+
+class AuthorHeaderCache:
+    """Кеш отрисованной шапки страницы автора."""
+
+    TEMPLATE_NAME = "users/includes/author_header.html"
+
+    @staticmethod
+    def cache_key(author_id):
+        """Ключ кеша шапки автора."""
+        return f"author_header:{author_id}"
+
+    @staticmethod
+    def get(author_id):
+        """HTML шапки автора, при промахе кеша - одним запросом к БД."""
+        key = AuthorHeaderCache.cache_key(author_id)
+        html = cache.get(key)
+        if html is None:
+            author = get_object_or_404(authors_with_post_stats(), pk=author_id)
+            html = render_to_string(AuthorHeaderCache.TEMPLATE_NAME, {"author": author})
+            cache.set(key, html, AUTHOR_HEADER_CACHE_TIMEOUT)
+        return html
+
+    @staticmethod
+    def invalidate(*author_ids):
+        """Сбрасывает закешированные шапки авторов."""
+        cache.delete_many([AuthorHeaderCache.cache_key(pk) for pk in author_ids if pk])
@@ -0,0 +1,33 @@
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from post.services import ResponseCache
+from post.thumbnails import ensure_thumbnails
+from users.models import User
+from users.services import AuthorHeaderCache
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=User)
+def make_avatar_thumbnails(sender, instance, raw, update_fields, **kwargs):
+    """Создает уменьшенные копии аватара пользователя при загрузке."""
+    if raw or (update_fields is not None and "avatar" not in update_fields):
+        return
+    try:
+        ensure_thumbnails(instance.avatar)
+    except OSError:
+        logger.exception("Не удалось создать превью для %s", instance.avatar.name)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_author_pages(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает закешированные страницы с постами автора."""
+    # Вход пользователя обновляет только last_login и на страницы не влияет
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    ResponseCache.invalidate(f"author:{instance.pk}")
+    AuthorHeaderCache.invalidate(instance.pk)
@@ -1,8 +1,19 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from post.models import Post
+from post.thumbnails import thumbnail_name
 from users.models import User
+from users.views import AuthorDetailView, AuthorListView
 
 
 class CreateSuperUserCommandTest(TestCase):
@@ -90,3 +101,121 @@ class UserTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(User.objects.all().count(), 2)
         self.assertEqual(User.objects.last().phone, "802977777717")
+
+    def test_avatar_thumbnails(self):
+        """Тестирование создания превью аватара при загрузке."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        buffer = BytesIO()
+        Image.new("RGB", (600, 600), "#777").save(buffer, format="JPEG")
+
+        with override_settings(MEDIA_ROOT=media_root):
+            self.user.avatar = SimpleUploadedFile("avatar.jpg", buffer.getvalue())
+            self.user.save()
+            name = self.user.avatar.name
+
+            self.assertTrue(default_storage.exists(thumbnail_name(name, 140, "webp")))
+            self.assertTrue(default_storage.exists(thumbnail_name(name, 280, "jpg")))
+
+
+class AuthorListViewTests(TestCase):
+    """Тесты каталога авторов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.authors = [
+            User.objects.create(
+                phone=f"8029000000{number:02}",
+                email=f"author{number}@test.com",
+                last_name=f"Автор {number:02}",
+                is_author=True,
+            )
+            for number in range(15)
+        ]
+        User.objects.create(phone=80291111111, email="reader@test.com")
+        for number in range(3):
+            Post.objects.create(author=self.authors[0], title=f"Пост {number}")
+
+    def test_paginated_with_post_counts(self):
+        """Тестирование пагинации и числа постов автора."""
+        url = reverse("users:authors")
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        page = response.context["object_list"]
+        self.assertEqual(len(page), AuthorListView.paginate_by)
+        self.assertEqual(page[0], self.authors[0])
+        self.assertEqual(page[0].post_count, 3)
+        self.assertIsNotNone(page[0].latest_post_at)
+        self.assertEqual(page[1].post_count, 0)
+        self.assertIsNone(page[1].latest_post_at)
+        self.assertContains(response, "Постов: 3")
+
+        response = self.client.get(url, {"page": 2})
+        self.assertEqual(len(response.context["object_list"]), 3)
+
+
+class AuthorDetailViewTests(TestCase):
+    """Тесты страницы автора."""
+
+    def setUp(self):
+        """Подготовка тестовых данных перед каждым тестом.."""
+        cache.clear()
+        self.author = User.objects.create(
+            phone="80290000001",
+            email="author@test.com",
+            first_name="Иван",
+            last_name="Петров",
+            is_author=True,
+        )
+        self.other = User.objects.create(
+            phone="80290000002", email="other@test.com", is_author=True
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, title=f"Пост {number}", is_free=True
+            )
+            for number in range(12)
+        ]
+        Post.objects.create(author=self.other, title="Чужой пост", is_free=True)
+        self.url = reverse("users:author-detail", args=[self.author.pk])
+
+    def test_feed_with_cursor_pagination(self):
+        """Тестирование ленты постов автора и перехода по курсору."""
+        response = self.client.get(self.url)
+        self.assertContains(response, "Иван Петров")
+        self.assertContains(response, "Постов: 12")
+        self.assertNotContains(response, "Чужой пост")
+        page = response.context["page_obj"]
+        self.assertEqual(list(page), self.posts[::-1][: AuthorDetailView.paginate_by])
+
+        response = self.client.get(self.url, {"cursor": page.next_cursor})
+        self.assertEqual(list(response.context["page_obj"]), self.posts[2::-1])
+
+    def test_fixed_number_of_queries(self):
+        """Тестирование числа запросов при холодном и теплом кеше шапки."""
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Постов: 12")
+
+    def test_header_invalidation(self):
+        """Тестирование сброса шапки при изменении автора и его постов."""
+        self.client.get(self.url)
+        self.author.first_name = "Пётр"
+        self.author.save()
+        self.assertContains(self.client.get(self.url), "Пётр Петров")
+
+        Post.objects.create(author=self.author, title="Новый пост")
+        self.assertContains(self.client.get(self.url), "Постов: 13")
+
+        self.posts[0].delete()
+        self.assertContains(self.client.get(self.url), "Постов: 12")
+
+    def test_not_author(self):
+        """Тестирование 404 для пользователя без статуса автора."""
+        reader = User.objects.create(phone="80290000003", email="reader@test.com")
+        response = self.client.get(reverse("users:author-detail", args=[reader.pk]))
+        self.assertEqual(response.status_code, 404)
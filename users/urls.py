@@ -5,8 +5,8 @@ from rest_framework_simplejwt.views import (TokenObtainPairView,
                                             TokenRefreshView)
 
 from users.apps import UsersConfig
-from users.views import (AuthorListView, ProfileView, RegisterAPIView,
-                         RegisterView, sms_verification)
+from users.views import (AuthorDetailView, AuthorListView, ProfileView,
+                         RegisterAPIView, RegisterView, sms_verification)
 
 app_name = UsersConfig.name
 
@@ -27,4 +27,5 @@ urlpatterns = [
     path("sms-confirm/", sms_verification, name="sms-confirm"),
     path("profile/", ProfileView.as_view(), name="profile"),
     path("authors/", AuthorListView.as_view(), name="authors"),
+    path("authors/<int:pk>/", AuthorDetailView.as_view(), name="author-detail"),
 ]
@@ -1,14 +1,20 @@
 from django.shortcuts import redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils.safestring import mark_safe
 from django.views.generic import CreateView, ListView, UpdateView
 from rest_framework.generics import CreateAPIView, get_object_or_404
 from rest_framework.permissions import AllowAny
 
+from post.models import Post
+from post.paginators import KeysetPaginationMixin
+from post.services import PostCardCache
+from post.views import POST_CARD_FIELDS
 from users.forms import AuthorForm, ProfileForm, RegistrationForm
 from users.models import User
 from users.permissions import CustomLoginRequiredMixin
 from users.serializers import RegisterSerializer
-from users.services import generate_unique_token
+from users.services import (AuthorHeaderCache, authors_with_post_stats,
+                            generate_unique_token)
 
 
 class RegisterView(CreateView):
@@ -69,10 +75,49 @@ class AuthorListView(ListView):
 
     model = User
     form_class = AuthorForm
+    paginate_by = 12
+    # Сессия, пользователь, статус подписки, число авторов и страница авторов.
+    query_budget = 5
 
     def get_queryset(self):
-        """Возвращает список авторов, отсортированных по фамилии."""
-        return User.objects.filter(is_author=True).order_by("last_name")
+        """
+        Возвращает авторов, отсортированных по фамилии, с числом постов и датой последнего.
+
+        Подзапросы считаются только для авторов страницы, а не для всех.
+        """
+        return authors_with_post_stats().order_by("last_name", "id")
+
+
+class AuthorDetailView(KeysetPaginationMixin, ListView):
+    """Контроллер страницы автора с лентой его постов."""
+
+    template_name = "users/author_detail.html"
+    ordering = ("-id",)
+    paginate_by = 9
+    # Сессия, пользователь, статус подписки, шапка автора и страница постов.
+    query_budget = 5
+
+    def get(self, request, *args, **kwargs):
+        """Берет шапку автора из кеша до выборки его постов."""
+        self.author_header = AuthorHeaderCache.get(kwargs["pk"])
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """Посты автора от новых к старым по индексу (author_id, id)."""
+        return (
+            Post.objects.filter(author_id=self.kwargs["pk"])
+            .only(*POST_CARD_FIELDS)
+            .order_by(*self.ordering)
+        )
+
+    def get_context_data(self, **kwargs):
+        """Добавляет шапку автора и карточки постов страницы."""
+        context = super().get_context_data(**kwargs)
+        context["author_header"] = mark_safe(self.author_header)
+        context["post_cards"] = PostCardCache.render_many(
+            context["object_list"], self.request.user
+        )
+        return context
 
 
 class RegisterAPIView(CreateAPIView):